@@ -20,12 +20,16 @@ Usage:
 """
 
 import sys
+import os
 import json
 import argparse
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
+import asyncio
 import base64
+import hashlib
 import io
+import math
 
 try:
     import pikepdf
@@ -35,7 +39,7 @@ except ImportError:
     sys.exit(1)
 
 try:
-    from PIL import Image
+    from PIL import Image, ImageChops
 except ImportError:
     print("Error: Pillow is not installed. Run: pip install Pillow")
     sys.exit(1)
@@ -44,59 +48,126 @@ except ImportError:
 ANTHROPIC_AVAILABLE = False
 try:
     import anthropic
-    import os
     if os.environ.get('ANTHROPIC_API_KEY'):
         ANTHROPIC_AVAILABLE = True
 except ImportError:
     pass
 
+ALT_TEXT_MODEL = "claude-3-5-sonnet-20241022"
+ALT_TEXT_PROMPT = ("Provide a concise alt text description for this image (1-2 sentences, "
+                   "suitable for screen readers). Focus on the main content and purpose of the image.")
+
+# Maximum number of Claude requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Retries for rate-limited (HTTP 429) requests, with exponential backoff
+RATE_LIMIT_RETRIES = 4
+
+# Claude's vision input gains nothing from a longer edge than this
+MAX_IMAGE_EDGE = 1568
+JPEG_QUALITY = 85
+
+# Small images (icons, thumbnails) are stacked into one picture per request
+BATCH_MAX_EDGE = 256
+BATCH_SIZE = 6
+BATCH_GAP = 5
+ALT_TEXT_BATCH_PROMPT = ("This picture contains {count} images stacked top to bottom, separated by "
+                         "{gap}px white gaps. For each of the {count} images, in order, write a concise "
+                         "alt text description (1-2 sentences, suitable for screen readers) focusing on "
+                         "its main content and purpose. Reply with only a JSON array of {count} strings.")
+
+# Images are also compared by a difference hash (dHash) of a HASH_SIZE-wide
+# grayscale thumbnail, so re-encoded or rescaled copies share one request:
+# two images match when their hashes differ in at most HASH_MAX_DISTANCE of
+# the HASH_SIZE**2 bits and their aspect ratios by at most ASPECT_TOLERANCE.
+# With skip_decorative (--skip-decorative), images of at most
+# DECORATIVE_MAX_EDGE pixels whose ENTROPY_EDGE-pixel grayscale thumbnail has
+# less histogram entropy than DECORATIVE_ENTROPY bits (solid fills, rules,
+# gradients) are treated as decorative and left out of the structure tree,
+# without alt text. It is opt-in: flat-colour logos and charts can fall
+# under the threshold too. The small thumbnail keeps thin-lined diagrams and
+# screenshots, whose full-size histograms are mostly background, above it.
+HASH_SIZE = 16
+HASH_MAX_DISTANCE = 12
+ASPECT_TOLERANCE = 0.02
+ENTROPY_EDGE = 16
+DECORATIVE_ENTROPY = 2.0
+DECORATIVE_MAX_EDGE = 512
+SIGNATURE_MAX_EDGE = 256
+
+# Images whose colour channels differ by at most GRAYSCALE_TOLERANCE levels
+# on a GRAYSCALE_CHECK_EDGE-pixel thumbnail are sent as 8-bit grayscale,
+# a third of the pixel data of RGB
+GRAYSCALE_CHECK_EDGE = 256
+GRAYSCALE_TOLERANCE = 4
+
+# JPEG colour spaces Claude can read straight from the image stream
+PASSTHROUGH_JPEG_COLORSPACES = frozenset([Name.DeviceRGB, Name.DeviceGray])
+
+
+def _image_filters(obj) -> List:
+    """
+    Return the /Filter entry of an image stream as a list.
+    """
+    filters = obj.get('/Filter')
+    if filters is None:
+        return []
+    if isinstance(filters, Array):
+        return list(filters)
+    return [filters]
+
 
-def extract_images_from_pdf(pdf_path: str) -> List[Dict]:
+def _is_passthrough_jpeg(obj) -> bool:
     """
-    Extract all images from PDF with their locations.
-    Returns list of dicts with page number, image data, and position info.
+    Check if an image stream is a JPEG that Claude can read as-is.
+    CMYK and /Decode-inverted JPEGs still need a decode pass.
+    """
+    return (_image_filters(obj) == [Name.DCTDecode]
+            and obj.get('/ColorSpace') in PASSTHROUGH_JPEG_COLORSPACES
+            and '/Decode' not in obj)
+
+
+def iter_images(pdf: pikepdf.Pdf) -> Iterator[Dict]:
     """
-    print(f"Extracting images from: {pdf_path}")
-    pdf = pikepdf.open(pdf_path)
+    Yield the images of an open PDF one at a time, in page order, as dicts
+    with page number, image object, and size info.
 
-    images = []
+    No pixel data is loaded here; _materialize() decodes an image when it is
+    actually needed and _release() drops it again.
+    The image dicts reference objects in `pdf`, so keep it open while using them.
+    """
     image_counter = 0
 
     for page_num, page in enumerate(pdf.pages, start=1):
         print(f"  Scanning page {page_num}...")
 
-        if '/Resources' not in page or '/XObject' not in page.Resources:
+        resources = page.get('/Resources')
+        if resources is None:
+            continue
+        xobjects = resources.get('/XObject')
+        if xobjects is None:
             continue
-
-        xobjects = page.Resources.XObject
 
         for key, obj in xobjects.items():
             try:
-                if obj.Subtype == Name.Image:
+                if obj.get('/Subtype') == Name.Image:
                     image_counter += 1
 
                     # Get image data
                     try:
-                        pil_image = pikepdf.PdfImage(obj).as_pil_image()
-
-                        # Convert to bytes for processing
-                        img_bytes = io.BytesIO()
-                        pil_image.save(img_bytes, format='PNG')
-                        img_bytes.seek(0)
-
-                        images.append({
+                        img = {
                             'id': image_counter,
                             'page': page_num,
                             'key': str(key),
                             'obj': obj,
-                            'pil_image': pil_image,
-                            'bytes': img_bytes.getvalue(),
-                            'width': pil_image.width,
-                            'height': pil_image.height,
+                            'width': int(obj.Width),
+                            'height': int(obj.Height),
                             'alt_text': None
-                        })
+                        }
 
-                        print(f"    Found image #{image_counter}: {pil_image.width}x{pil_image.height}")
+                        print(f"    Found image #{image_counter}: {img['width']}x{img['height']}")
+
+                        yield img
 
                     except Exception as e:
                         print(f"    Warning: Could not extract image data: {e}")
@@ -104,54 +175,407 @@ def extract_images_from_pdf(pdf_path: str) -> List[Dict]:
             except Exception as e:
                 continue
 
-    pdf.close()
+
+def extract_images_from_pdf(pdf: pikepdf.Pdf) -> List[Dict]:
+    """
+    Extract all images from an open PDF with their locations (see iter_images).
+    Returns list of dicts with page number, image data, and position info.
+    """
+    print(f"Extracting images from: {pdf.filename}")
+
+    images = list(iter_images(pdf))
+
     print(f"\nTotal images found: {len(images)}")
     return images
 
 
-def generate_alt_text_with_claude(image_bytes: bytes) -> str:
+def _set_digests(images: List[Dict]):
     """
-    Generate alt text for an image using Claude API.
+    Set 'digest' on each image: a fingerprint of its stream, so repeated
+    images can be spotted. An image object drawn on several pages is only
+    read once; an image that can't be read gets a digest of its own.
     """
-    if not ANTHROPIC_AVAILABLE:
-        return None
+    digests = {}
+    for img in images:
+        obj = img['obj']
+        objgen = obj.objgen
+        if objgen != (0, 0) and objgen in digests:
+            img['digest'] = digests[objgen]
+            continue
+
+        try:
+            digest = hashlib.blake2b(obj.read_raw_bytes(), digest_size=16)
+            digest.update(f"{img['width']}x{img['height']}".encode('ascii'))
+            img['digest'] = digest.digest()
+        except Exception:
+            img['digest'] = f"unreadable #{img['id']}".encode('ascii')
+
+        if objgen != (0, 0):
+            digests[objgen] = img['digest']
+
+
+def _downscale(pil_image):
+    """
+    Shrink an image so its longest edge is at most MAX_IMAGE_EDGE.
+    """
+    if max(pil_image.size) <= MAX_IMAGE_EDGE:
+        return pil_image
+
+    scale = MAX_IMAGE_EDGE / max(pil_image.size)
+    size = (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale)))
+    return pil_image.resize(size, Image.LANCZOS)
+
+
+def _looks_grayscale(pil_image) -> bool:
+    """
+    Check if an image has (next to) no colour.
+    """
+    if pil_image.mode in ('1', 'L', 'LA', 'I', 'I;16', 'F'):
+        return True
+
+    if max(pil_image.size) > GRAYSCALE_CHECK_EDGE:
+        scale = GRAYSCALE_CHECK_EDGE / max(pil_image.size)
+        pil_image = pil_image.resize((max(1, round(pil_image.width * scale)),
+                                      max(1, round(pil_image.height * scale))), Image.BOX)
+    red, green, blue = pil_image.convert('RGB').split()
+
+    return (ImageChops.difference(red, green).getextrema()[1] <= GRAYSCALE_TOLERANCE
+            and ImageChops.difference(green, blue).getextrema()[1] <= GRAYSCALE_TOLERANCE)
+
 
+def _encode_jpeg(pil_image) -> bytes:
+    """
+    Encode a PIL image as JPEG at JPEG_QUALITY, with optimized Huffman tables
+    (a smaller upload for a little more encoding time).
+    """
+    if pil_image.mode not in ('RGB', 'L'):
+        pil_image = pil_image.convert('L' if pil_image.mode in ('1', 'LA', 'I', 'I;16') else 'RGB')
+
+    buf = io.BytesIO()
+    pil_image.save(buf, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def _materialize(img: Dict):
+    """
+    Load the pixel data of an extracted image.
+    JPEG images keep their raw stream bytes ('bytes'); other images are
+    decoded to a PIL image ('pil_image').
+    """
+    if 'bytes' in img or 'pil_image' in img:
+        return
+
+    if _is_passthrough_jpeg(img['obj']):
+        img['bytes'] = img['obj'].read_raw_bytes()
+    else:
+        img['pil_image'] = pikepdf.PdfImage(img['obj']).as_pil_image()
+
+
+def _release(img: Dict):
+    """
+    Drop the pixel data loaded by _materialize().
+    """
+    img.pop('bytes', None)
+    img.pop('pil_image', None)
+
+
+def _image_payload(img: Dict, grayscale: bool = False) -> Tuple[bytes, str]:
+    """
+    Return (image_bytes, media_type) to send to Claude for an extracted image.
+
+    Images are downscaled to MAX_IMAGE_EDGE and sent as JPEG, in grayscale if
+    they have no colour or `grayscale` is set. Passthrough JPEGs that are
+    already small enough are sent unchanged unless `grayscale` is set.
+    """
+    if 'bytes' in img:
+        if max(img['width'], img['height']) <= MAX_IMAGE_EDGE and not grayscale:
+            return img['bytes'], 'image/jpeg'
+
+        pil_image = Image.open(io.BytesIO(img['bytes']))
+        # Let libjpeg decode at a reduced scale (and only the luminance) where it can
+        pil_image.draft('L' if grayscale else pil_image.mode, (MAX_IMAGE_EDGE, MAX_IMAGE_EDGE))
+    else:
+        pil_image = img['pil_image']
+
+    pil_image = _downscale(pil_image)
+    if grayscale or _looks_grayscale(pil_image):
+        pil_image = pil_image.convert('L')
+
+    return _encode_jpeg(pil_image), 'image/jpeg'
+
+
+def _pil_image(img: Dict):
+    """
+    Return a PIL image for an extracted image, for display.
+    """
+    if 'pil_image' in img:
+        return img['pil_image']
+    return Image.open(io.BytesIO(img['bytes']))
+
+
+def _image_signature(img: Dict) -> Tuple[int, float]:
+    """
+    Return (dHash, grayscale entropy in bits) of a materialized image.
+    """
+    pil_image = _pil_image(img)
+    if 'bytes' in img:
+        pil_image.draft('L', (SIGNATURE_MAX_EDGE, SIGNATURE_MAX_EDGE))
+    gray = pil_image.convert('L')
+    gray.thumbnail((SIGNATURE_MAX_EDGE, SIGNATURE_MAX_EDGE))
+
+    scale = ENTROPY_EDGE / max(gray.size)
+    thumbnail = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))),
+                            Image.BOX)
+    histogram = thumbnail.histogram()
+    total = sum(histogram)
+    entropy = -sum(n / total * math.log2(n / total) for n in histogram if n)
+
+    # One bit per pixel: is it brighter than its right-hand neighbour
+    pixels = gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR).tobytes()
+    dhash = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            dhash = (dhash << 1) | (left > pixels[row * (HASH_SIZE + 1) + col + 1])
+
+    return dhash, entropy
+
+
+def _batch_payload(batch: List[Dict], grayscale: bool = False) -> Tuple[bytes, str]:
+    """
+    Stack the (materialized) images of a batch vertically into one PNG,
+    separated by BATCH_GAP pixels of white. The PNG is grayscale if none of
+    the images has colour or `grayscale` is set.
+    """
+    pil_images = [_pil_image(img) for img in batch]
+    mode = 'L' if grayscale or all(_looks_grayscale(im) for im in pil_images) else 'RGB'
+    pil_images = [im.convert(mode) for im in pil_images]
+
+    width = max(im.width for im in pil_images)
+    height = sum(im.height for im in pil_images) + BATCH_GAP * (len(pil_images) - 1)
+    canvas = Image.new(mode, (width, height), 'white')
+
+    y = 0
+    for im in pil_images:
+        canvas.paste(im, (0, y))
+        y += im.height + BATCH_GAP
+
+    buf = io.BytesIO()
+    canvas.save(buf, format='PNG')
+    return buf.getvalue(), 'image/png'
+
+
+def _parse_batch_alt_texts(text: str, count: int) -> Optional[List[str]]:
+    """
+    Parse the JSON array of alt texts returned for a batch.
+    Returns None unless it holds exactly `count` strings.
+    """
     try:
-        client = anthropic.Anthropic()
-
-        # Encode image to base64
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
-
-        message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=200,
-            messages=[{
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/png",
-                            "data": base64_image
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": "Provide a concise alt text description for this image (1-2 sentences, suitable for screen readers). Focus on the main content and purpose of the image."
+        alt_texts = json.loads(text[text.find('['):text.rfind(']') + 1])
+    except ValueError:
+        return None
+
+    if (not isinstance(alt_texts, list) or len(alt_texts) != count
+            or not all(isinstance(t, str) for t in alt_texts)):
+        return None
+    return [t.strip() for t in alt_texts]
+
+
+def _alt_text_request(image_bytes: bytes, media_type: str, prompt: str = ALT_TEXT_PROMPT,
+                      max_tokens: int = 200) -> Dict:
+    """
+    Build the Messages API arguments for an alt text request.
+    """
+    # Encode image to base64 (the output is pure ASCII, so skip UTF-8 validation)
+    base64_image = base64.b64encode(image_bytes).decode('ascii')
+
+    return {
+        "model": ALT_TEXT_MODEL,
+        "max_tokens": max_tokens,
+        "messages": [{
+            "role": "user",
+            "content": [
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": media_type,
+                        "data": base64_image
                     }
-                ]
-            }]
-        )
+                },
+                {
+                    "type": "text",
+                    "text": prompt
+                }
+            ]
+        }]
+    }
+
+
+async def _create_message(client, request: Dict, label: str) -> Optional[str]:
+    """
+    Send one alt text request, retrying with backoff when rate limited.
+    Returns the reply text, or None on failure.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            message = await client.messages.create(**request)
+            return message.content[0].text.strip()
+
+        except anthropic.RateLimitError:
+            if attempt == RATE_LIMIT_RETRIES:
+                print(f"Error generating alt text for {label}: rate limited")
+                return None
+            await asyncio.sleep(2 ** attempt)
+
+        except Exception as e:
+            print(f"Error generating alt text for {label}: {e}")
+            return None
+
+
+# Shared client, so repeated calls reuse its HTTP connection pool
+_ANTHROPIC_CLIENT = None
+
+
+def _get_client():
+    """
+    Return the shared Claude client, creating it on first use.
+    """
+    global _ANTHROPIC_CLIENT
+    if _ANTHROPIC_CLIENT is None:
+        _ANTHROPIC_CLIENT = anthropic.Anthropic()
+    return _ANTHROPIC_CLIENT
+
+
+def generate_alt_text_with_claude(image_bytes: bytes, media_type: str = 'image/png') -> Optional[str]:
+    """
+    Generate alt text for one encoded image using Claude API.
+    A blocking call for use outside an event loop; add_alt_text_auto_async
+    is the concurrent path used for whole documents.
+    """
+    if not ANTHROPIC_AVAILABLE:
+        return None
 
-        alt_text = message.content[0].text.strip()
-        return alt_text
+    try:
+        message = _get_client().messages.create(**_alt_text_request(image_bytes, media_type))
+        return message.content[0].text.strip()
 
     except Exception as e:
         print(f"Error generating alt text with Claude: {e}")
         return None
 
 
+async def _generate_alt_text_async(client, semaphore: asyncio.Semaphore, img: Dict,
+                                   grayscale: bool = False) -> Optional[str]:
+    """
+    Generate alt text for one image.
+    """
+    async with semaphore:
+        # Only images with a request in flight hold pixel data. Decoding reads
+        # the PDF, so it stays on this thread; encoding runs in a worker thread
+        # (Pillow releases the GIL while encoding)
+        # A payload prepared while grouping (see add_alt_text_auto_async) is used as is
+        try:
+            if 'payload' in img:
+                image_bytes, media_type = img.pop('payload')
+            else:
+                _materialize(img)
+                image_bytes, media_type = await asyncio.to_thread(_image_payload, img, grayscale)
+        except Exception as e:
+            print(f"Error reading image #{img['id']}: {e}")
+            return None
+        finally:
+            _release(img)
+
+        return await _create_message(client, _alt_text_request(image_bytes, media_type),
+                                     f"image #{img['id']}")
+
+
+async def _generate_batch_alt_texts_async(client, semaphore: asyncio.Semaphore,
+                                          batch: List[Dict], grayscale: bool = False) -> List[Optional[str]]:
+    """
+    Generate alt text for a batch of small images in one request.
+    Falls back to one request per image if the reply can't be parsed.
+    """
+    alt_texts = None
+    # Batches are grouped by width, so their ids need not be contiguous
+    label = "images " + ", ".join(f"#{img['id']}" for img in batch)
+
+    async with semaphore:
+        try:
+            for img in batch:
+                _materialize(img)
+            image_bytes, media_type = await asyncio.to_thread(_batch_payload, batch, grayscale)
+        except Exception as e:
+            print(f"Error reading {label}: {e}")
+            image_bytes = None
+        finally:
+            for img in batch:
+                _release(img)
+
+        if image_bytes is not None:
+            prompt = ALT_TEXT_BATCH_PROMPT.format(count=len(batch), gap=BATCH_GAP)
+            text = await _create_message(
+                client,
+                _alt_text_request(image_bytes, media_type, prompt, max_tokens=200 * len(batch)),
+                label
+            )
+            if text is not None:
+                alt_texts = _parse_batch_alt_texts(text, len(batch))
+
+    if alt_texts is None:
+        # The semaphore is released first; the single requests take it themselves
+        alt_texts = await asyncio.gather(
+            *[_generate_alt_text_async(client, semaphore, img, grayscale) for img in batch]
+        )
+
+    return alt_texts
+
+
+def _make_batches(images: List[Dict]) -> Tuple[List[Dict], List[List[Dict]]]:
+    """
+    Split images into those sent on their own and batches of small images.
+    Small images are grouped by similar width so the stacked picture stays compact.
+    """
+    small = sorted((img for img in images if max(img['width'], img['height']) <= BATCH_MAX_EDGE),
+                   key=lambda img: img['width'])
+    singles = [img for img in images if max(img['width'], img['height']) > BATCH_MAX_EDGE]
+
+    batches = [small[i:i + BATCH_SIZE] for i in range(0, len(small), BATCH_SIZE)]
+    # A batch of one gains nothing over a plain request
+    if batches and len(batches[-1]) == 1:
+        singles.append(batches.pop()[0])
+
+    return singles, batches
+
+
+async def _generate_alt_texts(images: List[Dict], grayscale: bool = False) -> List[Optional[str]]:
+    """
+    Generate alt text for all images concurrently, in image order.
+    All requests share one client (and connection pool); it is bound to this
+    event loop, so it is not reused across asyncio.run() calls.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    singles, batches = _make_batches(images)
+
+    print(f"Sending {len(singles) + len(batches)} requests "
+          f"({len(batches)} batches of small images, {MAX_CONCURRENT_REQUESTS} at a time)...\n")
+
+    async with anthropic.AsyncAnthropic() as client:
+        single_results, batch_results = await asyncio.gather(
+            asyncio.gather(*[_generate_alt_text_async(client, semaphore, img, grayscale)
+                             for img in singles]),
+            asyncio.gather(*[_generate_batch_alt_texts_async(client, semaphore, batch, grayscale)
+                             for batch in batches])
+        )
+
+    alt_texts = {img['id']: alt_text for img, alt_text in zip(singles, single_results)}
+    for batch, results in zip(batches, batch_results):
+        alt_texts.update((img['id'], alt_text) for img, alt_text in zip(batch, results))
+
+    return [alt_texts[img['id']] for img in images]
+
+
 def add_alt_text_interactive(images: List[Dict]) -> List[Dict]:
     """
     Interactively ask user for alt text for each image.
@@ -167,7 +591,8 @@ def add_alt_text_interactive(images: List[Dict]) -> List[Dict]:
 
         # Try to show image if possible
         try:
-            img['pil_image'].show()
+            _materialize(img)
+            _pil_image(img).show()
         except:
             print("  (Could not display image)")
 
@@ -178,12 +603,21 @@ def add_alt_text_interactive(images: List[Dict]) -> List[Dict]:
         else:
             img['alt_text'] = alt_text
 
+        # Pixel data is no longer needed once alt text is set
+        _release(img)
+
     return images
 
 
-def add_alt_text_auto(images: List[Dict]) -> List[Dict]:
+async def add_alt_text_auto_async(images: List[Dict], grayscale: bool = False,
+                                  skip_decorative: bool = False) -> List[Dict]:
     """
     Automatically generate alt text using Claude API.
+    The requests run concurrently, up to MAX_CONCURRENT_REQUESTS at a time;
+    callers without an event loop can use add_alt_text_auto.
+    With `grayscale`, all images are sent in grayscale, not only colourless ones.
+    With `skip_decorative`, small near-blank images get no alt text and are
+    left out of the structure tree (see DECORATIVE_ENTROPY).
     """
     if not ANTHROPIC_AVAILABLE:
         print("Error: Claude API not available. Set ANTHROPIC_API_KEY environment variable.")
@@ -192,12 +626,78 @@ def add_alt_text_auto(images: List[Dict]) -> List[Dict]:
     print("\n" + "="*60)
     print("AUTOMATIC ALT TEXT GENERATION")
     print("="*60)
-    print("Using Claude API to generate alt text for images...\n")
+    print("Using Claude API to generate alt text for images...")
+
+    # Identical images (e.g. a logo on every page) only need one request.
+    # Only this path needs the digests, so they are computed here
+    _set_digests(images)
+    unique = {}
+    for img in images:
+        unique.setdefault(img['digest'], img)
+
+    # Near-identical ones neither, and decorative ones need none at all.
+    # groups maps each digest to the digest of the image sent for it.
+    # Each image is decoded once: an image that gets a request keeps what it
+    # needs, the encoded payload of a large image or the pixels of a small
+    # one (for its batch), and the rest is released right away
+    groups = {}
+    requests = {}
+    signatures = []
+    for digest, img in unique.items():
+        try:
+            _materialize(img)
+            dhash, entropy = _image_signature(img)
+        except Exception:
+            _release(img)
+            dhash, entropy = None, DECORATIVE_ENTROPY
+
+        # A soft mask can draw a shape (e.g. a logo) with a uniform image
+        if (skip_decorative and entropy < DECORATIVE_ENTROPY and '/SMask' not in img['obj']
+                and max(img['width'], img['height']) <= DECORATIVE_MAX_EDGE):
+            groups[digest] = None
+            _release(img)
+            continue
+
+        # Rescaled copies keep their aspect ratio and (nearly) their dHash
+        aspect = img['width'] / img['height']
+        groups[digest] = next(
+            (key for key, key_dhash, key_aspect in signatures
+             if dhash is not None and key_dhash is not None
+             and abs(aspect - key_aspect) <= ASPECT_TOLERANCE * key_aspect
+             and bin(dhash ^ key_dhash).count('1') <= HASH_MAX_DISTANCE),
+            digest
+        )
+        if groups[digest] != digest:
+            _release(img)
+            continue
+
+        signatures.append((digest, dhash, aspect))
+        requests[digest] = img
+        if max(img['width'], img['height']) > BATCH_MAX_EDGE and ('bytes' in img or 'pil_image' in img):
+            # If encoding fails here, the request decodes it again and reports the error
+            try:
+                img['payload'] = _image_payload(img, grayscale)
+            except Exception:
+                pass
+            finally:
+                _release(img)
+
+    decorative = sum(1 for img in images if groups[img['digest']] is None)
+    print(f"{len(requests)} distinct images out of {len(images)} ({decorative} decorative)")
+
+    alt_texts = dict(zip(requests, await _generate_alt_texts(list(requests.values()), grayscale))) if requests else {}
 
     for img in images:
-        print(f"Processing image #{img['id']} (Page {img['page']})...")
-        alt_text = generate_alt_text_with_claude(img['bytes'])
+        group = groups[img['digest']]
+        print(f"Image #{img['id']} (Page {img['page']}):")
 
+        if group is None:
+            img['alt_text'] = ""
+            img['decorative'] = True
+            print(f"  Decorative, left out of the structure tree")
+            continue
+
+        alt_text = alt_texts[group]
         if alt_text:
             img['alt_text'] = alt_text
             print(f"  Alt text: {alt_text}")
@@ -208,6 +708,14 @@ def add_alt_text_auto(images: List[Dict]) -> List[Dict]:
     return images
 
 
+def add_alt_text_auto(images: List[Dict], grayscale: bool = False,
+                      skip_decorative: bool = False) -> List[Dict]:
+    """
+    Automatically generate alt text using Claude API (see add_alt_text_auto_async).
+    """
+    return asyncio.run(add_alt_text_auto_async(images, grayscale, skip_decorative))
+
+
 def add_alt_text_from_file(images: List[Dict], alt_text_file: str) -> List[Dict]:
     """
     Load alt text from JSON file.
@@ -260,34 +768,39 @@ def create_structure_tree_with_images(pdf, images: List[Dict], existing_metadata
     else:
         document_elem = struct_tree_root.K[0]
 
-    # Add Figure elements for each image with alt text
+    # Build Figure elements for each image with alt text; decorative images
+    # get none. They stay direct objects: only the Document element they
+    # point back to must be indirect
+    figures = []
     for img in images:
         if img['alt_text']:
-            figure_elem = pdf.make_indirect(Dictionary(
+            figures.append(Dictionary(
                 Type=Name.StructElem,
                 S=Name.Figure,
                 P=document_elem,
                 Alt=String(img['alt_text']),
                 K=Array([])  # Could link to actual content, but minimal is okay
             ))
-
-            if '/K' not in document_elem:
-                document_elem.K = Array([])
-
-            document_elem.K.append(figure_elem)
             print(f"  Added Figure element for image #{img['id']} with alt text")
 
-    print(f"Structure tree updated with {len([i for i in images if i['alt_text']])} Figure elements")
+    # Attach them in one assignment, after any existing children
+    # (/K may hold a single child rather than an array)
+    kids = document_elem.get('/K')
+    existing = list(kids) if isinstance(kids, Array) else ([kids] if kids is not None else [])
+    document_elem.K = Array(existing + figures)
+
+    print(f"Structure tree updated with {len(figures)} Figure elements")
 
 
-def add_alt_text_to_pdf(input_path: str, output_path: str, images: List[Dict], metadata: Dict = None):
+def add_alt_text_to_pdf(pdf: pikepdf.Pdf, output_path: str, images: List[Dict], metadata: Dict = None,
+                        linearize: bool = False):
     """
     Create enhanced PDF with alt text in structure tree.
+    `pdf` is the open PDF the images were extracted from; the caller closes it.
+    Set `linearize` only for PDFs served over the web.
     """
     print(f"\nCreating accessible PDF: {output_path}")
 
-    pdf = pikepdf.open(input_path)
-
     # Create structure tree with Figure elements
     create_structure_tree_with_images(pdf, images, metadata)
 
@@ -307,9 +820,12 @@ def add_alt_text_to_pdf(input_path: str, output_path: str, images: List[Dict], m
         if metadata.get('language'):
             pdf.Root.Lang = String(metadata['language'])
 
-    # Save
-    pdf.save(output_path, linearize=True)
-    pdf.close()
+    # Save, packing the small structure dictionaries into object streams and
+    # copying existing streams (e.g. large images) through without recompressing
+    pdf.save(output_path, linearize=linearize,
+             object_stream_mode=pikepdf.ObjectStreamMode.generate,
+             compress_streams=True,
+             stream_decode_level=pikepdf.StreamDecodeLevel.none)
 
     print("PDF saved with alt text!")
 
@@ -330,6 +846,11 @@ def main():
     group.add_argument("--alt-text-file",
                       help="JSON file with alt text (format: {\"1\": \"text\", ...})")
 
+    parser.add_argument("--grayscale-alt-input", action="store_true",
+                       help="With --auto, send all images to Claude in grayscale (smaller uploads)")
+    parser.add_argument("--skip-decorative", action="store_true",
+                       help="With --auto, leave small near-blank images (fills, rules) out without alt text")
+
     # Optional metadata
     parser.add_argument("--title", help="Document title")
     parser.add_argument("--author", help="Document author")
@@ -338,22 +859,27 @@ def main():
     # Export alt text to file
     parser.add_argument("--export-alt-text", help="Export alt text to JSON file")
 
+    parser.add_argument("--linearize", action="store_true",
+                       help="Linearize output for page-at-a-time web viewing (slower to save)")
+
     args = parser.parse_args()
 
     if not Path(args.pdf_path).exists():
         print(f"Error: File not found: {args.pdf_path}")
         sys.exit(1)
 
-    # Step 1: Extract images
-    images = extract_images_from_pdf(args.pdf_path)
+    # Step 1: Extract images (the PDF stays open until it is saved)
+    pdf = pikepdf.open(args.pdf_path, access_mode=pikepdf.AccessMode.mmap)
+    images = extract_images_from_pdf(pdf)
 
     if not images:
+        pdf.close()
         print("\nNo images found in PDF. Nothing to do.")
         sys.exit(0)
 
     # Step 2: Get alt text
     if args.auto:
-        images = add_alt_text_auto(images)
+        images = add_alt_text_auto(images, args.grayscale_alt_input, args.skip_decorative)
     elif args.interactive:
         images = add_alt_text_interactive(images)
     elif args.alt_text_file:
@@ -373,7 +899,8 @@ def main():
         'language': args.language
     }
 
-    add_alt_text_to_pdf(args.pdf_path, args.output, images, metadata)
+    add_alt_text_to_pdf(pdf, args.output, images, metadata, linearize=args.linearize)
+    pdf.close()
 
     # Summary
     print("\n" + "="*60)
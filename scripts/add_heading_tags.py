@@ -7,6 +7,7 @@ Uses font size and text characteristics to identify heading hierarchy.
 
 Requirements:
     pip install pikepdf pypdf
+    pip install pymupdf  # optional, faster text extraction
 
 Usage:
     python add_heading_tags.py input.pdf --output output.pdf
@@ -14,11 +15,17 @@ Usage:
 """
 
 import sys
+import os
+import re
+import math
 import json
 import argparse
 from pathlib import Path
-from typing import List, Dict, Tuple
-from collections import defaultdict
+from typing import List, Dict, Tuple, Optional
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 try:
     import pikepdf
@@ -33,122 +40,285 @@ except ImportError:
     print("Error: pypdf is not installed. Run: pip install pypdf")
     sys.exit(1)
 
+# Optional: PyMuPDF reads text with font sizes many times faster than pypdf
+PYMUPDF_AVAILABLE = False
+try:
+    import pymupdf
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    pass
+
+
+# Common heading keywords (English and Swedish)
+HEADING_KEYWORDS = frozenset([
+    'introduction', 'background', 'method', 'result', 'discussion',
+    'conclusion', 'summary', 'overview', 'chapter', 'section',
+    'föreläsning', 'introduktion', 'bakgrund', 'metod', 'resultat',
+    'diskussion', 'sammanfattning', 'översikt', 'kapitel'
+])
+
+# One case-insensitive scan for any keyword (substring match, like "results")
+HEADING_RE = re.compile('|'.join(map(re.escape, sorted(HEADING_KEYWORDS))), re.IGNORECASE)
+
+# Minimum font size, relative to the body text, for each heading level
+FONT_SIZE_LEVELS = ((1, 1.8), (2, 1.4), (3, 1.15))
+
+# The same thresholds in ascending order, for bisect: the number of them a
+# ratio reaches indexes its level
+_LEVEL_RATIOS = [min_ratio for _, min_ratio in reversed(FONT_SIZE_LEVELS)]
+_LEVELS_BY_RANK = [0] + [level for level, _ in reversed(FONT_SIZE_LEVELS)]
+
+# Documents with at least this many pages have their lines read by a pool of
+# worker processes (font decoding in pypdf is pure Python, so threads would not
+# help). Each worker reparses the whole file, so shorter documents are faster
+# to read on one process
+PARALLEL_FONT_MIN_PAGES = 32
+MAX_EXTRACT_WORKERS = 8
+
+# Structure types of heading elements, indexed by level (1-6)
+_H = (None,) + tuple(Name(f'/H{level}') for level in range(1, 7))
+HEADING_TYPES = frozenset(_H[1:])
 
-def extract_text_with_fonts(pdf_path: str) -> List[Dict]:
+
+def heading_type(level) -> Name:
     """
-    Extract text from PDF with font size information.
-    Returns list of text blocks with font metadata.
+    Structure type (/H1-/H6) of a heading level. Levels from a headings file
+    may be out of range: they are clamped to 1-6.
     """
-    print(f"Analyzing PDF text structure: {pdf_path}")
-    reader = PdfReader(pdf_path)
+    return _H[max(1, min(int(level), 6))]
+
+
+def _page_lines(page) -> List[Tuple[str, float]]:
+    """
+    Collect (line, font_size) pairs for a page from pypdf's text visitor.
+    The font size of a line is the largest effective size used on it.
+    """
+    lines = []
+    parts = []
+    size = 0.0
+
+    def visit(text, cm, tm, font_dict, font_size):
+        nonlocal size
+        pieces = text.split('\n')
+        for i, piece in enumerate(pieces):
+            if i:
+                lines.append((''.join(parts), size))
+                parts.clear()
+                size = 0.0
+            if piece.strip():
+                parts.append(piece)
+                # Tf size scaled by the text and graphics matrices
+                size = max(size, font_size * math.hypot(tm[2], tm[3]) * math.hypot(cm[2], cm[3]))
+
+    page.extract_text(visitor_text=visit)
+    lines.append((''.join(parts), size))
+
+    return [(line.strip(), line_size) for line, line_size in lines if line.strip()]
+
+
+def _body_font_size(sizes: List[Tuple[float, int]]) -> float:
+    """
+    Return the font size carrying the most characters (the body text size).
+    """
+    chars_by_size = defaultdict(int)
+    for size, char_count in sizes:
+        chars_by_size[round(size, 1)] += char_count
+    return max(chars_by_size, key=chars_by_size.get) if chars_by_size else 0.0
+
 
-    text_blocks = []
-    block_id = 0
+def level_from_font_size(size: float, body_size: float) -> int:
+    """
+    Map a font size to a heading level relative to the body text size.
+    Returns 0 when the size says nothing (body-sized or unknown).
+    """
+    if size <= 0 or body_size <= 0:
+        return 0
+    return _LEVELS_BY_RANK[bisect_right(_LEVEL_RATIOS, size / body_size)]
 
-    for page_num, page in enumerate(reader.pages, start=1):
-        # Extract text with font info
+
+def _page_range_lines(reader: PdfReader, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """
+    Return (page_num, line, font_size) for the lines of pages [start, stop).
+    """
+    page_lines = []
+    for page_num in range(start + 1, stop + 1):
         try:
-            # Get page text
-            page_text = page.extract_text()
+            lines = _page_lines(reader.pages[page_num - 1])
+        except Exception as e:
+            print(f"  Warning: Could not process page {page_num}: {e}")
+            continue
+
+        page_lines.extend((page_num, line, size) for line, size in lines)
+    return page_lines
+
+
+def _extract_page_range_lines(pdf_path: str, start: int, stop: int) -> List[Tuple[int, str, float]]:
+    """
+    Worker process: _page_range_lines with its own reader.
+    """
+    return _page_range_lines(PdfReader(pdf_path), start, stop)
+
 
-            if not page_text.strip():
+def _extract_page_lines_pymupdf(pdf_path: str) -> List[Tuple[int, str, float]]:
+    """
+    _extract_page_lines with PyMuPDF: a line's font size is the largest
+    size among its non-blank spans.
+    """
+    page_lines = []
+    with pymupdf.open(pdf_path) as doc:
+        for page_num, page in enumerate(doc, start=1):
+            try:
+                blocks = page.get_text("dict")["blocks"]
+            except Exception as e:
+                print(f"  Warning: Could not process page {page_num}: {e}")
                 continue
 
-            # Split into lines
-            lines = page_text.split('\n')
+            for block in blocks:
+                for line in block.get("lines", ()):
+                    spans = [span for span in line["spans"] if span["text"].strip()]
+                    text = ''.join(span["text"] for span in line["spans"]).strip()
+                    if text:
+                        page_lines.append((page_num, text, max(span["size"] for span in spans)))
+    return page_lines
 
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
 
-                block_id += 1
+def _extract_page_lines(reader: PdfReader, pdf_path: str,
+                        parallel: bool = True) -> List[Tuple[int, str, float]]:
+    """
+    Return (page_num, line, font_size) for every line of the document, in order.
 
-                # Heuristic detection of headings based on text characteristics
-                is_likely_heading = detect_heading_heuristic(line)
-                estimated_level = estimate_heading_level(line, lines)
+    Documents with at least PARALLEL_FONT_MIN_PAGES pages are split into
+    contiguous page ranges that worker processes read in parallel. The
+    workers can't use `reader`: each one reparses the file from `pdf_path`.
+    If the pool fails, or with `parallel=False`, the pages are read one by
+    one with `reader`.
+    """
+    page_count = len(reader.pages)
+    workers = min(os.cpu_count() or 1, MAX_EXTRACT_WORKERS, page_count)
 
-                text_blocks.append({
-                    'id': block_id,
-                    'page': page_num,
-                    'text': line,
-                    'is_heading': is_likely_heading,
-                    'level': estimated_level,
-                    'char_count': len(line),
-                    'word_count': len(line.split())
-                })
+    if parallel and page_count >= PARALLEL_FONT_MIN_PAGES and workers > 1:
+        bounds = [page_count * i // workers for i in range(workers + 1)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                ranges = pool.map(_extract_page_range_lines, [pdf_path] * workers, bounds[:-1], bounds[1:])
+                return [line for page_range in ranges for line in page_range]
+        except (OSError, BrokenProcessPool) as e:
+            print(f"  Warning: Parallel extraction failed, reading pages one by one: {e}")
 
-        except Exception as e:
-            print(f"  Warning: Could not process page {page_num}: {e}")
-            continue
+    return _page_range_lines(reader, 0, page_count)
 
-    print(f"Extracted {len(text_blocks)} text blocks")
+
+def read_page_lines(pdf_path: str, reader: Optional[PdfReader] = None,
+                    parallel: bool = True) -> List[Tuple[int, str, float]]:
+    """
+    Return (page_num, line, font_size) for every non-empty line of the PDF,
+    read with PyMuPDF when it is installed and with pypdf otherwise.
+
+    Pass a `reader` to reuse an already parsed PDF. Only the serial pypdf
+    path uses it: PyMuPDF opens the file itself, and so do the worker
+    processes of documents with PARALLEL_FONT_MIN_PAGES or more pages.
+    With `parallel=False` no worker processes are started, e.g. when called
+    from a thread while other threads are running.
+    """
+    if PYMUPDF_AVAILABLE:
+        return _extract_page_lines_pymupdf(pdf_path)
+
+    if reader is None:
+        reader = PdfReader(pdf_path)
+    return _extract_page_lines(reader, pdf_path, parallel)
+
+
+def extract_text_with_fonts(pdf_path: str, reader: Optional[PdfReader] = None,
+                            page_lines: Optional[List[Tuple[int, str, float]]] = None) -> List[Dict]:
+    """
+    Extract text from PDF with font size information.
+    Returns list of text blocks with font metadata.
+    Pass a `reader` to reuse an already parsed PDF (see read_page_lines), or
+    `page_lines` already returned by read_page_lines.
+    """
+    print(f"Analyzing PDF text structure: {pdf_path}")
+
+    # Collect the non-empty lines of every page first
+    if page_lines is None:
+        page_lines = read_page_lines(pdf_path, reader)
+
+    body_size = _body_font_size([(size, len(line)) for _, line, size in page_lines])
+
+    # Then classify them all in one pass; a document uses only a handful of
+    # distinct sizes, so each is mapped to a level once
+    classified = map(classify_line, [line for _, line, _ in page_lines])
+    size_levels = {size: level_from_font_size(size, body_size) for size in {size for _, _, size in page_lines}}
+
+    text_blocks = [
+        {
+            'id': block_id,
+            'page': page_num,
+            'text': line,
+            'is_heading': is_likely_heading,
+            # Real font size wins; the text heuristic covers body-sized headings
+            'level': size_levels[size] or estimated_level,
+            'font_size': round(size, 1),
+            'char_count': len(line),
+            'word_count': len(line.split())
+        }
+        for block_id, ((page_num, line, size), (is_likely_heading, estimated_level))
+        in enumerate(zip(page_lines, classified), start=1)
+    ]
+
+    print(f"Extracted {len(text_blocks)} text blocks (body font size {body_size:g}pt)")
     return text_blocks
 
 
-def detect_heading_heuristic(text: str) -> bool:
+def classify_line(line: str) -> Tuple[bool, int]:
     """
-    Detect if text is likely a heading using heuristics.
+    Classify a line of text in a single pass.
+
+    Returns:
+        Tuple of (is_likely_heading, estimated_level) where level is 1-6
     """
-    # Short text (< 100 chars)
-    if len(text) > 100:
-        return False
+    stripped = line.strip()
+    length = len(stripped)
+    upper = stripped.isupper()
+    first = stripped[:1]
+    starts_digit = first.isdigit()
+
+    # Estimate heading level from the same text characteristics
+    if length < 30 and upper:
+        level = 1  # Very short and all caps = H1
+    elif starts_digit and not stripped[1:2].isdigit():
+        level = 2  # Starts with single digit = H2
+    elif length < 20:
+        level = 2
+    elif length < 40:
+        level = 3
+    else:
+        level = 4
 
-    # No ending punctuation (headings usually don't end with period)
-    if text.endswith('.') or text.endswith(','):
-        return False
+    # Short text (< 100 chars), no ending punctuation
+    if length > 100 or stripped.endswith(('.', ',')):
+        return False, level
 
     # All caps might be heading
-    if text.isupper() and len(text) > 3:
-        return True
+    if upper and length > 3:
+        return True, level
 
     # Title case (most words capitalized)
-    words = text.split()
+    words = stripped.split()
     if len(words) > 1:
-        capitalized = sum(1 for w in words if w and w[0].isupper())
+        # ASCII range check first; only non-ASCII initials (Å, Ä, Ö) need isupper()
+        capitalized = sum(1 for w in words if 'A' <= w[0] <= 'Z' or (w[0] > '\x7f' and w[0].isupper()))
         if capitalized / len(words) > 0.6:  # 60% capitalized
-            return True
+            return True, level
 
-    # Starts with number (like "1. Introduction")
-    if text and (text[0].isdigit() or text.startswith('•') or text.startswith('-')):
-        return True
+    # Starts with number (like "1. Introduction") or a bullet
+    if starts_digit or first in ('•', '-'):
+        return True, level
 
     # Contains common heading keywords
-    heading_keywords = ['introduction', 'background', 'method', 'result', 'discussion',
-                       'conclusion', 'summary', 'overview', 'chapter', 'section',
-                       'föreläsning', 'introduktion', 'bakgrund', 'metod', 'resultat',
-                       'diskussion', 'sammanfattning', 'översikt', 'kapitel']
-
-    text_lower = text.lower()
-    if any(kw in text_lower for kw in heading_keywords):
-        return True
-
-    return False
+    if HEADING_RE.search(stripped):
+        return True, level
 
-
-def estimate_heading_level(line: str, all_lines: List[str]) -> int:
-    """
-    Estimate heading level (1-6) based on text characteristics.
-    """
-    # Very short and all caps = H1
-    if len(line) < 30 and line.isupper():
-        return 1
-
-    # Starts with single digit = H2
-    if line and line[0].isdigit() and not line[1:2].isdigit():
-        return 2
-
-    # Starts with multi-digit (like "1.1") = H3
-    if line and len(line) > 2 and line[0].isdigit() and line[1] in '.):':
-        return 3
-
-    # Default based on length
-    if len(line) < 20:
-        return 2
-    elif len(line) < 40:
-        return 3
-    else:
-        return 4
+    return False, level
 
 
 def identify_headings(text_blocks: List[Dict]) -> List[Dict]:
@@ -203,13 +373,15 @@ def load_manual_headings(headings_file: str) -> List[Dict]:
     return headings
 
 
-def add_heading_structure_tree(pdf_path: str, output_path: str, headings: List[Dict], metadata: Dict = None):
+def add_heading_structure_tree(pdf_path: str, output_path: str, headings: List[Dict], metadata: Dict = None,
+                               linearize: bool = False):
     """
     Add heading elements to PDF structure tree.
+    Set `linearize` only for PDFs served over the web.
     """
     print(f"\nCreating PDF with heading structure: {output_path}")
 
-    pdf = pikepdf.open(pdf_path)
+    pdf = pikepdf.open(pdf_path, access_mode=pikepdf.AccessMode.mmap)
 
     # Create or get structure tree root
     if '/StructTreeRoot' not in pdf.Root:
@@ -238,23 +410,24 @@ def add_heading_structure_tree(pdf_path: str, output_path: str, headings: List[D
     # Add heading elements
     print("Adding heading elements to structure tree...")
 
+    # Heading elements stay direct objects: only the Document element they
+    # point back to must be indirect
+    heading_elems = []
     for heading in headings:
-        level = min(heading['level'], 6)  # H1-H6
-        heading_tag = Name(f'/H{level}')
-
-        heading_elem = pdf.make_indirect(Dictionary(
+        heading_elems.append(Dictionary(
             Type=Name.StructElem,
-            S=heading_tag,
+            S=heading_type(heading['level']),
             P=document_elem,
             K=Array([]),
             # Note: Ideally would link to actual content, but minimal structure is acceptable
             T=String(heading['text'])  # Title/text of heading
         ))
 
-        if '/K' not in document_elem:
-            document_elem.K = Array([])
-
-        document_elem.K.append(heading_elem)
+    # Attach them in one assignment, after any existing children
+    # (/K may hold a single child rather than an array)
+    kids = document_elem.get('/K')
+    existing = list(kids) if isinstance(kids, Array) else ([kids] if kids is not None else [])
+    document_elem.K = Array(existing + heading_elems)
 
     print(f"Added {len(headings)} heading elements")
 
@@ -274,8 +447,12 @@ def add_heading_structure_tree(pdf_path: str, output_path: str, headings: List[D
         if metadata.get('language'):
             pdf.Root.Lang = String(metadata['language'])
 
-    # Save
-    pdf.save(output_path, linearize=True)
+    # Save, packing the small structure dictionaries into object streams and
+    # copying existing streams (e.g. large images) through without recompressing
+    pdf.save(output_path, linearize=linearize,
+             object_stream_mode=pikepdf.ObjectStreamMode.generate,
+             compress_streams=True,
+             stream_decode_level=pikepdf.StreamDecodeLevel.none)
     pdf.close()
 
     print("PDF saved with heading structure!")
@@ -304,6 +481,9 @@ def main():
     parser.add_argument("--author", help="Document author")
     parser.add_argument("--language", default="en", help="Document language")
 
+    parser.add_argument("--linearize", action="store_true",
+                       help="Linearize output for page-at-a-time web viewing (slower to save)")
+
     args = parser.parse_args()
 
     if not Path(args.pdf_path).exists():
@@ -331,7 +511,7 @@ def main():
         'language': args.language
     }
 
-    add_heading_structure_tree(args.pdf_path, args.output, headings, metadata)
+    add_heading_structure_tree(args.pdf_path, args.output, headings, metadata, linearize=args.linearize)
 
     # Verify
     print("\n" + "="*60)
@@ -345,13 +525,10 @@ def main():
         if '/K' in struct and len(struct.K) > 0:
             doc = struct.K[0]
             if '/K' in doc:
-                heading_elements = [e for e in doc.K if hasattr(e, 'S') and str(e.S).startswith('/H')]
-                print(f"[OK] Structure tree with {len(heading_elements)} heading elements")
-
-                # Count by level
-                by_level = defaultdict(int)
-                for elem in heading_elements:
-                    by_level[str(elem.S)] += 1
+                # Count by level, comparing the /S names directly
+                kinds = Counter(e.get('/S') for e in doc.K if isinstance(e, Dictionary))
+                by_level = {str(name): kinds[name] for name in HEADING_TYPES if kinds[name]}
+                print(f"[OK] Structure tree with {sum(by_level.values())} heading elements")
 
                 for level in sorted(by_level.keys()):
                     print(f"  {level}: {by_level[level]} elements")
@@ -5,6 +5,7 @@ This creates a minimal structure tree for accessibility compliance
 """
 
 import sys
+import shutil
 from pathlib import Path
 
 try:
@@ -15,6 +16,31 @@ except ImportError:
     sys.exit(1)
 
 
+# Document info entries written from the metadata dict
+DOCINFO_FIELDS = {'title': '/Title', 'author': '/Author', 'subject': '/Subject', 'keywords': '/Keywords'}
+
+
+def is_already_tagged(pdf, metadata: dict = None) -> bool:
+    """
+    Check whether the PDF already has everything this script would set,
+    so that saving it again would change nothing.
+    """
+    root = pdf.Root
+    if ('/StructTreeRoot' not in root
+            or root.get('/MarkInfo', Dictionary()).get('/Marked') != True
+            or root.get('/ViewerPreferences', Dictionary()).get('/DisplayDocTitle') != True):
+        return False
+
+    if metadata:
+        if metadata.get('language') and str(root.get('/Lang', '')) != metadata['language']:
+            return False
+        for field, key in DOCINFO_FIELDS.items():
+            if str(pdf.docinfo.get(key, '')) != (metadata.get(field) or ''):
+                return False
+
+    return True
+
+
 def add_structure_tree_to_pdf(input_path: str, output_path: str, metadata: dict = None):
     """
     Add a basic structure tree to a PDF file.
@@ -24,27 +50,44 @@ def add_structure_tree_to_pdf(input_path: str, output_path: str, metadata: dict
     It does NOT create detailed content structure tags - that requires source document access.
     """
     print(f"Opening PDF with pikepdf: {input_path}")
-    pdf = pikepdf.open(input_path, allow_overwriting_input=True)
+    same_file = Path(output_path).resolve() == Path(input_path).resolve()
+
+    # Memory-map the input so only the objects we touch are read from disk
+    pdf = pikepdf.open(input_path, access_mode=pikepdf.AccessMode.mmap)
+
+    # Nothing to change: skip the full rewrite
+    if is_already_tagged(pdf, metadata):
+        pdf.close()
+        print("  PDF is already tagged with this metadata")
+        if not same_file:
+            shutil.copyfile(input_path, output_path)
+            print(f"Copied unchanged to: {output_path}")
+        return True
+
+    # Overwriting the input in place needs an in-memory copy instead
+    if same_file:
+        pdf.close()
+        pdf = pikepdf.open(input_path, allow_overwriting_input=True)
 
     # Create or update structure tree
     if '/StructTreeRoot' not in pdf.Root:
         print("Creating structure tree...")
 
         # Create minimal structure tree
-        struct_tree_root = Dictionary(
+        struct_tree_root = pdf.make_indirect(Dictionary(
             Type=Name('/StructTreeRoot'),
             K=Array([]),
             ParentTree=Dictionary(Nums=Array([])),
             RoleMap=Dictionary()
-        )
+        ))
 
-        # Add Document element as root
-        document_elem = Dictionary(
+        # Add Document element as root (both are indirect, since they refer to each other)
+        document_elem = pdf.make_indirect(Dictionary(
             Type=Name('/StructElem'),
             S=Name('/Document'),
             P=struct_tree_root,
             K=Array([])
-        )
+        ))
 
         struct_tree_root.K.append(document_elem)
         pdf.Root.StructTreeRoot = struct_tree_root
@@ -83,10 +126,8 @@ def add_structure_tree_to_pdf(input_path: str, output_path: str, metadata: dict
             print(f"  Warning: XMP metadata update failed: {e}")
 
         # Also set traditional document info
-        pdf.docinfo['/Title'] = metadata.get('title', '')
-        pdf.docinfo['/Author'] = metadata.get('author', '')
-        pdf.docinfo['/Subject'] = metadata.get('subject', '')
-        pdf.docinfo['/Keywords'] = metadata.get('keywords', '')
+        for field, key in DOCINFO_FIELDS.items():
+            pdf.docinfo[key] = metadata.get(field) or ''
 
         # Set catalog language
         if metadata.get('language'):
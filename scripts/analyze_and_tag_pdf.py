@@ -11,27 +11,62 @@ Requirements:
 
 Usage:
     python analyze_and_tag_pdf.py <pdf_file_path> [--output <output_path>]
+    python analyze_and_tag_pdf.py --batch <directory> [--output <output_dir>]
 """
 
 import sys
+import os
+import atexit
 import argparse
 import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Iterator
 import re
 
 try:
-    from pypdf import PdfReader, PdfWriter
+    from pypdf import PdfReader, PdfWriter, DocumentInformation
 except ImportError:
     print("Error: pypdf is not installed. Run: pip install pypdf")
     sys.exit(1)
 
 try:
-    from langdetect import detect, detect_langs, LangDetectException
+    from langdetect import detect_langs, LangDetectException
+    from langdetect import detector_factory
+    from langdetect.detector_factory import DetectorFactory
 except ImportError:
     print("Error: langdetect is not installed. Run: pip install langdetect")
     sys.exit(1)
 
+# Languages langdetect chooses between. Loading all 55 profiles costs tens of
+# MB and most of the first detect() call; the toolkit targets EN/SV/DE/FR/ES
+LANGDETECT_LANGUAGES = ['en', 'sv', 'de', 'fr', 'es', 'it', 'pt', 'nl', 'no', 'da',
+                        'fi', 'ru', 'zh-cn', 'ja', 'ar']
+
+
+def _init_langdetect_factory():
+    """
+    Replacement for langdetect's init_factory() that loads only the
+    LANGDETECT_LANGUAGES profiles.
+    """
+    if detector_factory._factory is None:
+        profiles = []
+        for lang in LANGDETECT_LANGUAGES:
+            with open(Path(detector_factory.PROFILES_DIRECTORY) / lang, encoding='utf-8') as f:
+                profiles.append(f.read())
+
+        factory = DetectorFactory()
+        factory.load_json_profile(profiles)
+        detector_factory._factory = factory
+
+
+detector_factory.init_factory = _init_langdetect_factory
+# Same text, same answer (langdetect samples randomly otherwise)
+DetectorFactory.seed = 0
+
 # Optional: pikepdf for structure tree creation
 PIKEPDF_AVAILABLE = False
 try:
@@ -41,6 +76,14 @@ try:
 except ImportError:
     pass  # Will fall back to pypdf-only mode
 
+# Optional: tqdm for a progress bar in --batch mode
+TQDM_AVAILABLE = False
+try:
+    from tqdm import tqdm
+    TQDM_AVAILABLE = True
+except ImportError:
+    pass
+
 
 # Document type patterns (including multilingual support)
 DOC_TYPE_PATTERNS = {
@@ -126,6 +169,154 @@ DOC_TYPE_PATTERNS = {
     ],
 }
 
+# One case-insensitive alternation per document type, so the filename check
+# is one search per type instead of one per pattern. Only whether a type
+# matches matters there, so the alternatives need no groups.
+_COMPILED_DOC_TYPE = {
+    doc_type: re.compile("|".join(f"(?:{p})" for p in dict.fromkeys(patterns)), re.IGNORECASE)
+    for doc_type, patterns in DOC_TYPE_PATTERNS.items()
+}
+
+# All document types in a single alternation, so the content is scanned once
+# for every type. _DOC_TYPE_GROUPS maps each group number to the document type
+# it scores for and the weight (how often the pattern is listed).
+_DOC_TYPE_GROUPS = [(None, 0)] + [
+    (doc_type, patterns.count(p))
+    for doc_type, patterns in DOC_TYPE_PATTERNS.items()
+    for p in dict.fromkeys(patterns)
+]
+# Every pattern starts with \b followed by a letter: the shared \b and a
+# lookahead on the possible first letters let the engine skip almost every
+# position before trying the alternatives
+_SCAN_KEYWORDS = [p[2:] for patterns in DOC_TYPE_PATTERNS.values() for p in dict.fromkeys(patterns)]
+_DOC_TYPE_SCAN = re.compile(
+    r"\b(?=[" + "".join(sorted({k[0] for k in _SCAN_KEYWORDS})) + "])"
+    "(?:" + "|".join(f"({k})" for k in _SCAN_KEYWORDS) + ")",
+    re.IGNORECASE
+)
+
+# Word counts below/above which a document is tagged "brief"/"comprehensive"
+BRIEF_WORDS = 500
+COMPREHENSIVE_WORDS = 5000
+_WORD_RE = re.compile(r"\S+")
+
+# Fast analysis extracts only these pages (first, middle, last) instead of all
+# of them; --analyze-only switches to it for documents longer than FAST_AUTO_PAGES
+FAST_SAMPLE_PAGES = 3
+FAST_AUTO_PAGES = 50
+
+# Bullet and numbered list items, for the slide heuristic
+_BULLET_RE = re.compile(r"(^|\n)\s*[•\-*◦▪]\s+", re.MULTILINE)
+_NUMBERED_RE = re.compile(r"(^|\n)\s*\d+[\.)]\s+", re.MULTILINE)
+
+# The content scan stops early once a document type has at least this score
+# and leads every other type by at least this factor
+CONFIDENT_SCORE = 20
+CONFIDENT_LEAD = 2
+
+# Author lines on the first page (multilingual), as one alternation tried in
+# this order: a "by"-style prefix, a bare name, or a name followed by an email
+# address (author often near email). Lines are scanned in one pass, so
+# whitespace must not cross a line break: [^\S\n] is whitespace but not "\n".
+_AUTHOR_RE = re.compile(
+    r"^(?:"
+    r"(?:by|author|written by|presenter|instructor)(?:[^\S\n]|:)+(?P<en>.+?)"   # English
+    r"|(?P<name>[A-Z][a-z]+[^\S\n]+[A-Z][a-z]+(?:[^\S\n]+[A-Z][a-z]+)?)"       # Name pattern
+    r"|(?:av|författare|föreläsare)(?:[^\S\n]|:)+(?P<sv>.+?)"                 # Swedish
+    r"|(?:von|autor|verfasser)(?:[^\S\n]|:)+(?P<de>.+?)"                      # German
+    r"|(?:par|auteur)(?:[^\S\n]|:)+(?P<fr>.+?)"                               # French
+    r"|(?P<email>.+?)[^\S\n]*[<(]?[\w\.-]+@[\w\.-]+[>)]?"
+    r")$",
+    re.IGNORECASE | re.MULTILINE
+)
+_AUTHOR_PREFIX_RE = re.compile(r'^(by|av|von|par|author|författare)[\s:]+', re.IGNORECASE)
+_HAS_LETTER_RE = re.compile(r'[A-Za-zÀ-ÿ]')
+
+# Language detection only looks at the start of the text; langdetect's
+# accuracy saturates long before this, and the rest would only cost time
+LANGUAGE_SAMPLE_CHARS = 50_000
+
+# Documents with more pages than this have their text extracted by a pool of
+# worker processes (pypdf is pure Python, so threads would not help)
+PARALLEL_EXTRACT_MIN_PAGES = 32
+MAX_EXTRACT_WORKERS = 8
+
+# Detected languages are cached on disk, keyed by a hash of the sampled text,
+# so repeated runs over similar documents (course material, templates) skip
+# detection. Batch workers hand their new entries to the parent, which writes
+# the file (see _process_batch_file)
+LANGUAGE_CACHE_FILE = Path.home() / ".cache" / "pdf-accessibility-toolkit" / "langcache.json"
+LANGUAGE_CACHE_SIZE = 1024
+
+# Whole analyses are cached next to it, one JSON file per PDF, so reruns over
+# unchanged files (e.g. workflow runs with different image options) skip the
+# analysis entirely. A PDF is fingerprinted by its first ANALYSIS_CACHE_PREFIX
+# bytes, size and modification time; bump ANALYSIS_CACHE_VERSION whenever the
+# analysis output changes
+ANALYSIS_CACHE_DIR = LANGUAGE_CACHE_FILE.parent / "analysis"
+ANALYSIS_CACHE_PREFIX = 1 << 20
+ANALYSIS_CACHE_VERSION = 1
+
+# Setting PDF_ACCESSIBILITY_NO_CACHE (or passing --no-cache) turns both caches off
+CACHE_ENABLED = not os.environ.get("PDF_ACCESSIBILITY_NO_CACHE")
+
+# Content tags and the keywords that suggest them
+CONTENT_TAG_PATTERNS = [
+    ("visual-content", "visual", "diagram|figure|chart|graph|image"),
+    ("tabular-data", "table", "table|column|row"),
+    ("technical-content", "tech", "code|programming|function|class|variable"),
+    ("mathematical-content", "math", "equation|formula|theorem|proof"),
+    ("academic", "acad", "reference|citation|bibliography"),
+]
+
+# All content tags in one scan, one named group per tag; the first-letter
+# lookahead works as in _DOC_TYPE_SCAN
+_TAG_RE = re.compile(
+    r"\b(?=[" + "".join(sorted({w[0] for _, _, words in CONTENT_TAG_PATTERNS for w in words.split("|")})) + "])"
+    "(?:" + "|".join(f"(?P<{group}>{words})" for _, group, words in CONTENT_TAG_PATTERNS) + r")\b",
+    re.IGNORECASE
+)
+
+
+def iter_page_text(reader: PdfReader) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_index, page_text) for each page, extracting text lazily.
+    """
+    for page_idx, page in enumerate(reader.pages):
+        yield page_idx, page.extract_text()
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """
+    Worker process: extract the text of pages [start, stop) with its own reader.
+    """
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+def extract_page_texts(reader: PdfReader, pdf_path: Optional[str] = None,
+                       parallel: bool = True) -> List[str]:
+    """
+    Extract the text of every page, in page order.
+
+    Given the `pdf_path` of a document longer than PARALLEL_EXTRACT_MIN_PAGES,
+    the pages are split into contiguous ranges that worker processes extract
+    in parallel, each parsing the file itself; `parallel=False` turns that off.
+    """
+    page_count = len(reader.pages)
+    workers = min(os.cpu_count() or 1, MAX_EXTRACT_WORKERS)
+
+    if parallel and pdf_path is not None and page_count > PARALLEL_EXTRACT_MIN_PAGES and workers > 1:
+        bounds = [page_count * i // workers for i in range(workers + 1)]
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                ranges = pool.map(_extract_page_range, [pdf_path] * workers, bounds[:-1], bounds[1:])
+                return [page_text for page_range in ranges for page_text in page_range]
+        except (OSError, BrokenProcessPool) as e:
+            print(f"Warning: Parallel text extraction failed, extracting pages one by one: {e}")
+
+    return [page_text for _, page_text in iter_page_text(reader)]
+
 
 def extract_text_from_pdf(pdf_path: str) -> Tuple[str, int, bool]:
     """
@@ -134,25 +325,39 @@ def extract_text_from_pdf(pdf_path: str) -> Tuple[str, int, bool]:
     Returns:
         Tuple of (full_text, page_count, is_slides)
     """
-    reader = PdfReader(pdf_path)
-    page_count = len(reader.pages)
+    return summarize_page_text(extract_page_texts(PdfReader(pdf_path), pdf_path))
 
-    full_text = ""
-    text_per_page = []
 
-    for page in reader.pages:
-        page_text = page.extract_text()
-        full_text += page_text + "\n"
-        text_per_page.append(page_text)
+def extract_text_from_reader(reader: PdfReader) -> Tuple[str, int, bool]:
+    """
+    Same as extract_text_from_pdf, for an already opened PdfReader.
+    """
+    return summarize_page_text([page_text for _, page_text in iter_page_text(reader)])
+
+
+def summarize_page_text(text_per_page: List[str], page_count: Optional[int] = None) -> Tuple[str, int, bool]:
+    """
+    Join extracted page texts and detect if it's a slide-based format.
+    Pass `page_count` if the texts are a sample of the document's pages.
+
+    Returns:
+        Tuple of (full_text, page_count, is_slides)
+    """
+    if page_count is None:
+        page_count = len(text_per_page)
+    total_chars = sum(map(len, text_per_page))
+
+    # Joined once; each page is still followed by a newline
+    full_text = "".join(f"{page_text}\n" for page_text in text_per_page)
 
     # Detect if it's slides vs continuous text
     # Slides typically have:
     # - Less text per page (avg < 500 chars)
     # - More consistent page lengths
     # - Bullet points or numbered lists
-    avg_chars_per_page = sum(len(t) for t in text_per_page) / max(page_count, 1)
-    has_bullets = bool(re.search(r"(^|\n)\s*[•\-*◦▪]\s+", full_text, re.MULTILINE))
-    has_numbers = bool(re.search(r"(^|\n)\s*\d+[\.)]\s+", full_text, re.MULTILINE))
+    avg_chars_per_page = total_chars / max(len(text_per_page), 1)
+    has_bullets = bool(_BULLET_RE.search(full_text))
+    has_numbers = bool(_NUMBERED_RE.search(full_text))
 
     is_slides = (avg_chars_per_page < 600 and page_count > 3) or \
                 (has_bullets and page_count > 5) or \
@@ -161,9 +366,70 @@ def extract_text_from_pdf(pdf_path: str) -> Tuple[str, int, bool]:
     return full_text, page_count, is_slides
 
 
-def detect_language(text: str) -> Tuple[str, List[Tuple[str, float]]]:
+_language_cache = None
+# Entries detected by this process, written back once at exit
+_new_language_entries = {}
+
+
+def _get_language_cache() -> Dict:
+    """
+    Return the language cache, loading it from disk on first use.
+    """
+    global _language_cache
+    if _language_cache is None:
+        _language_cache = _read_language_cache()
+    return _language_cache
+
+
+def _read_language_cache() -> Dict:
+    """
+    Read the language cache file; a missing or unreadable file is an empty cache.
+    """
+    try:
+        with open(LANGUAGE_CACHE_FILE, encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def _save_language_cache() -> None:
+    """
+    Merge this process's new entries into the cache file and keep the newest
+    LANGUAGE_CACHE_SIZE. Runs once, at exit; the file is re-read first so
+    entries written by other runs in the meantime are kept.
+    The cache is only an optimization, so write failures are ignored.
+    """
+    entries = _read_language_cache()
+    for key, value in _new_language_entries.items():
+        entries.pop(key, None)
+        entries[key] = value
+    entries = dict(list(entries.items())[-LANGUAGE_CACHE_SIZE:])
+    try:
+        LANGUAGE_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so concurrent runs never see half a file
+        tmp_file = LANGUAGE_CACHE_FILE.with_name(f"{LANGUAGE_CACHE_FILE.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_file, LANGUAGE_CACHE_FILE)
+    except OSError:
+        pass
+
+
+def _record_language_entries(entries: Dict) -> None:
+    """
+    Queue new language cache entries for the write at exit.
+    """
+    if entries and not _new_language_entries:
+        atexit.register(_save_language_cache)
+    _new_language_entries.update(entries)
+
+
+def detect_language(text: str, use_cache: bool = True) -> Tuple[str, List[Tuple[str, float]]]:
     """
     Detect the primary language and language probabilities.
+    Results are cached on disk by text fingerprint, unless `use_cache` is
+    False or CACHE_ENABLED is off.
 
     Returns:
         Tuple of (primary_lang_code, [(lang_code, probability), ...])
@@ -171,42 +437,52 @@ def detect_language(text: str) -> Tuple[str, List[Tuple[str, float]]]:
     if not text or len(text.strip()) < 10:
         return "en", [("en", 1.0)]  # Default to English
 
-    try:
-        # Get primary language
-        primary = detect(text)
-
-        # Get all detected languages with probabilities
-        lang_probs = detect_langs(text)
-        lang_list = [(str(lp).split(':')[0], float(str(lp).split(':')[1]))
-                     for lp in lang_probs]
+    use_cache = use_cache and CACHE_ENABLED
+    key = hashlib.blake2b(text.encode('utf-8', 'ignore'), digest_size=16).hexdigest()
+    cache = _get_language_cache() if use_cache else {}
+    if key in cache:
+        primary, lang_list = cache[key]
+        return primary, [tuple(lp) for lp in lang_list]
 
-        return primary, lang_list
+    try:
+        # Get all detected languages with probabilities, most likely first;
+        # the primary language is the first, as detect() would return
+        lang_list = [(lp.lang, lp.prob) for lp in detect_langs(text)]
+        primary = lang_list[0][0] if lang_list else "unknown"
     except LangDetectException:
         return "en", [("en", 1.0)]
 
+    if use_cache:
+        cache[key] = [primary, lang_list]
+        _record_language_entries({key: cache[key]})
+
+    return primary, lang_list
+
 
 def classify_document_type(text: str, filename: str) -> str:
     """
     Classify the document type based on content and filename.
     """
-    text_lower = text.lower()
-    filename_lower = filename.lower()
+    # The patterns are case-insensitive, so no lowercased copy of the text is needed
 
     # Check filename first
-    for doc_type, patterns in DOC_TYPE_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, filename_lower, re.IGNORECASE):
-                return doc_type
+    for doc_type, pattern in _COMPILED_DOC_TYPE.items():
+        if pattern.search(filename):
+            return doc_type
 
     # Check content
-    scores = {}
-    for doc_type, patterns in DOC_TYPE_PATTERNS.items():
-        score = 0
-        for pattern in patterns:
-            matches = len(re.findall(pattern, text_lower, re.IGNORECASE))
-            score += matches
-        if score > 0:
-            scores[doc_type] = score
+    # Seeded in DOC_TYPE_PATTERNS order, so ties still go to the earlier type
+    scores = dict.fromkeys(DOC_TYPE_PATTERNS, 0)
+    for m in _DOC_TYPE_SCAN.finditer(text):
+        doc_type, weight = _DOC_TYPE_GROUPS[m.lastindex]
+        score = scores[doc_type] = scores[doc_type] + weight
+
+        # A clear winner needs no look at the rest of the text
+        if score >= CONFIDENT_SCORE:
+            runner_up = max(s for t, s in scores.items() if t != doc_type)
+            if score >= CONFIDENT_LEAD * runner_up:
+                break
+    scores = {doc_type: score for doc_type, score in scores.items() if score > 0}
 
     if scores:
         return max(scores, key=scores.get)
@@ -214,9 +490,19 @@ def classify_document_type(text: str, filename: str) -> str:
     return "document"  # Default
 
 
-def generate_content_tags(text: str, doc_type: str, is_slides: bool) -> List[str]:
+def _count_words(text: str, limit: int = COMPREHENSIVE_WORDS) -> int:
+    """
+    Count the words of `text`, stopping at limit + 1: past the "comprehensive"
+    threshold the rest of the text can't change the length tag.
+    """
+    return sum(1 for _ in islice(_WORD_RE.finditer(text), limit + 1))
+
+
+def generate_content_tags(text: str, doc_type: str, is_slides: bool,
+                          word_count: Optional[int] = None) -> List[str]:
     """
     Generate content-descriptive tags based on analysis.
+    Pass `word_count` if `text` is only a sample of the document.
     """
     tags = []
 
@@ -226,46 +512,50 @@ def generate_content_tags(text: str, doc_type: str, is_slides: bool) -> List[str
     # Add format
     tags.append("slides" if is_slides else "text-document")
 
-    # Analyze content for additional tags
-    text_lower = text.lower()
-
-    # Topic indicators
-    if re.search(r"\b(diagram|figure|chart|graph|image)\b", text_lower):
-        tags.append("visual-content")
-
-    if re.search(r"\b(table|column|row)\b", text_lower):
-        tags.append("tabular-data")
-
-    if re.search(r"\b(code|programming|function|class|variable)\b", text_lower):
-        tags.append("technical-content")
-
-    if re.search(r"\b(equation|formula|theorem|proof)\b", text_lower):
-        tags.append("mathematical-content")
-
-    if re.search(r"\b(reference|citation|bibliography)\b", text_lower):
-        tags.append("academic")
+    # Topic indicators (case-insensitive patterns, so no lowercased copy of the text)
+    hits = set()
+    for match in _TAG_RE.finditer(text):
+        hits.add(match.lastgroup)
+        if len(hits) == len(CONTENT_TAG_PATTERNS):
+            break
+    tags.extend(tag for tag, group, _ in CONTENT_TAG_PATTERNS if group in hits)
 
     # Length-based tags
-    word_count = len(text.split())
-    if word_count < 500:
+    if word_count is None:
+        word_count = _count_words(text)
+    if word_count < BRIEF_WORDS:
         tags.append("brief")
-    elif word_count > 5000:
+    elif word_count > COMPREHENSIVE_WORDS:
         tags.append("comprehensive")
 
     return tags
 
 
-def extract_title_from_pdf(reader: PdfReader, text: str) -> Optional[str]:
+def _first_page_text(reader: PdfReader, first_page_text: Optional[str]) -> Optional[str]:
+    """
+    Return the first page's text, extracting it only if the caller has none.
+    """
+    if first_page_text is None and reader.pages:
+        first_page_text = reader.pages[0].extract_text()
+    return first_page_text
+
+
+def extract_title_from_pdf(reader: PdfReader, text: str, first_page_text: Optional[str] = None,
+                           meta: Optional[DocumentInformation] = None) -> Optional[str]:
     """
     Extract or infer the document title.
+    Pass `first_page_text` if the first page has already been extracted, and
+    `meta` if the document info has already been read from the reader.
     """
     # First try metadata
-    if reader.metadata and reader.metadata.title:
-        return reader.metadata.title
+    if meta is None:
+        meta = reader.metadata
+    if meta and meta.title:
+        return meta.title
 
     # Try to extract from first page (common for title to be there)
-    if reader.pages:
-        first_page_text = reader.pages[0].extract_text()
+    first_page_text = _first_page_text(reader, first_page_text)
+    if first_page_text is not None:
         lines = [line.strip() for line in first_page_text.split('\n') if line.strip()]
         if lines:
             # First non-empty line is often the title
@@ -276,69 +566,75 @@ def extract_title_from_pdf(reader: PdfReader, text: str) -> Optional[str]:
     return None
 
 
-def extract_author_from_pdf(reader: PdfReader) -> Optional[str]:
+def extract_author_from_pdf(reader: PdfReader, first_page_text: Optional[str] = None,
+                            meta: Optional[DocumentInformation] = None) -> Optional[str]:
     """
     Extract author from PDF metadata or first page content.
     Looks for common author patterns on the first page.
+    Pass `first_page_text` and `meta` as for extract_title_from_pdf.
     """
     # First try existing metadata
-    if reader.metadata and reader.metadata.author:
-        author = reader.metadata.author
+    if meta is None:
+        meta = reader.metadata
+    if meta:
+        author = meta.author
         if author and author.strip():
             return author.strip()
 
     # Try to extract from first page
-    if not reader.pages:
+    first_page_text = _first_page_text(reader, first_page_text)
+    if first_page_text is None:
         return None
 
-    first_page_text = reader.pages[0].extract_text()
     lines = [line.strip() for line in first_page_text.split('\n') if line.strip()]
 
-    # Common author patterns (multilingual)
-    author_patterns = [
-        # English
-        r"^(?:by|author|written by|presenter|instructor)[\s:]+(.+?)$",
-        r"^([A-Z][a-z]+\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)$",  # Name pattern
-        # Swedish
-        r"^(?:av|författare|föreläsare)[\s:]+(.+?)$",
-        # German
-        r"^(?:von|autor|verfasser)[\s:]+(.+?)$",
-        # French
-        r"^(?:par|auteur)[\s:]+(.+?)$",
-        # Email pattern (author often near email)
-        r"^(.+?)\s*[<(]?[\w\.-]+@[\w\.-]+[>)]?$",
-    ]
-
-    # Check first 10 lines for author information
-    for i, line in enumerate(lines[:10]):
-        # Skip very short or very long lines
-        if len(line) < 3 or len(line) > 100:
-            continue
-
-        for pattern in author_patterns:
-            match = re.search(pattern, line, re.IGNORECASE)
-            if match:
-                if match.groups():
-                    author = match.group(1).strip()
-                else:
-                    author = match.group(0).strip()
-
-                # Validate author name
-                # Should be 2-50 chars, contain letters, may contain spaces/dots/hyphens
-                if 2 <= len(author) <= 50 and re.search(r'[A-Za-zÀ-ÿ]', author):
-                    # Remove common prefixes
-                    author = re.sub(r'^(by|av|von|par|author|författare)[\s:]+', '', author, flags=re.IGNORECASE)
-                    return author.strip()
+    # Check first 10 lines for author information, skipping very short or very long lines
+    candidates = "\n".join(line for line in lines[:10] if 3 <= len(line) <= 100)
+
+    # One scan over the candidate lines; matches come back in line order
+    for match in _AUTHOR_RE.finditer(candidates):
+        author = match.group(match.lastgroup).strip()
+
+        # Validate author name
+        # Should be 2-50 chars, contain letters, may contain spaces/dots/hyphens
+        if 2 <= len(author) <= 50 and _HAS_LETTER_RE.search(author):
+            # Remove common prefixes
+            author = _AUTHOR_PREFIX_RE.sub('', author)
+            return author.strip()
 
     return None
 
 
-def update_pdf_metadata(input_path: str, output_path: str, metadata: Dict) -> None:
+def _set_pdf_metadata(pdf, metadata: Dict) -> None:
+    """
+    Set the document info and accessibility flags of an open pikepdf PDF.
+    """
+    for key, field, default in (("/Title", "title", ""), ("/Author", "author", ""),
+                                ("/Subject", "subject", ""), ("/Keywords", "keywords", ""),
+                                ("/Language", "language", "en")):
+        pdf.docinfo[key] = PikeString(metadata.get(field, default))
+
+    # Display the document title, mark as tagged and set the catalog language (WCAG)
+    if '/ViewerPreferences' not in pdf.Root:
+        pdf.Root.ViewerPreferences = Dictionary()
+    pdf.Root.ViewerPreferences.DisplayDocTitle = True
+
+    if '/MarkInfo' not in pdf.Root:
+        pdf.Root.MarkInfo = Dictionary()
+    pdf.Root.MarkInfo.Marked = True
+
+    pdf.Root.Lang = PikeString(metadata.get("language", "en"))
+
+
+def _update_pdf_metadata_pypdf(input_path: str, output_path: str, metadata: Dict,
+                               reader: Optional[PdfReader] = None) -> None:
     """
-    Update PDF metadata with accessibility information.
-    Includes WCAG 2.1 AA compliance settings for Anthology Ally and similar tools.
+    Write the metadata and accessibility flags with pypdf (no structure
+    tree), for when pikepdf is not installed or fails.
+    Pass the `reader` used for analysis to avoid parsing the input again.
     """
-    reader = PdfReader(input_path)
+    if reader is None:
+        reader = PdfReader(input_path)
     writer = PdfWriter()
 
     # Copy all pages
@@ -364,7 +660,7 @@ def update_pdf_metadata(input_path: str, output_path: str, metadata: Dict) -> No
         viewer_prefs.update({
             NameObject("/DisplayDocTitle"): BooleanObject(True)
         })
-        writer._root_object.update({
+        writer.root_object.update({
             NameObject("/ViewerPreferences"): viewer_prefs
         })
 
@@ -374,12 +670,12 @@ def update_pdf_metadata(input_path: str, output_path: str, metadata: Dict) -> No
         mark_info.update({
             NameObject("/Marked"): BooleanObject(True)
         })
-        writer._root_object.update({
+        writer.root_object.update({
             NameObject("/MarkInfo"): mark_info
         })
 
         # Set document language in catalog (in addition to metadata)
-        writer._root_object.update({
+        writer.root_object.update({
             NameObject("/Lang"): TextStringObject(metadata.get("language", "en"))
         })
 
@@ -392,106 +688,253 @@ def update_pdf_metadata(input_path: str, output_path: str, metadata: Dict) -> No
         writer.write(output_file)
 
 
-def add_structure_tree_with_pikepdf(pdf_path: str, metadata: Dict) -> bool:
+def _add_structure_tree(pdf, metadata: Dict) -> None:
+    """
+    Add a minimal structure tree and XMP metadata to an open pikepdf PDF.
+    The tagging flags and catalog language are set by _set_pdf_metadata.
     """
-    Use pikepdf to add a structure tree to the PDF for better accessibility compliance.
-    This creates a minimal structure tree that satisfies "Tagged PDF" requirements.
+    # Add structure tree if it doesn't exist
+    if '/StructTreeRoot' not in pdf.Root:
+        # Create minimal structure tree
+        struct_tree_root = pdf.make_indirect(Dictionary(
+            Type=Name('/StructTreeRoot'),
+            K=Array([]),
+            ParentTree=Dictionary(Nums=Array([])),
+            RoleMap=Dictionary()
+        ))
+
+        # Add Document element as root (both are indirect, since they refer to each other)
+        document_elem = pdf.make_indirect(Dictionary(
+            Type=Name('/StructElem'),
+            S=Name('/Document'),
+            P=struct_tree_root,
+            K=Array([])
+        ))
+
+        struct_tree_root.K.append(document_elem)
+        pdf.Root.StructTreeRoot = struct_tree_root
+
+    # Update XMP metadata for better compliance
+    try:
+        with pdf.open_metadata() as meta:
+            if metadata.get("title"):
+                meta['dc:title'] = metadata["title"]
+            if metadata.get("author"):
+                meta['dc:creator'] = [metadata["author"]]
+            if metadata.get("subject"):
+                meta['dc:description'] = metadata["subject"]
+            if metadata.get("keywords"):
+                meta['pdf:Keywords'] = metadata["keywords"]
+            if metadata.get("language"):
+                meta['dc:language'] = [metadata["language"]]
+    except Exception:
+        pass  # XMP metadata is optional
+
+
+def write_tagged_pdf(input_path: str, output_path: str, metadata: Dict,
+                     reader: Optional[PdfReader] = None) -> bool:
+    """
+    Write the tagged copy of a PDF: metadata, accessibility flags and, with
+    pikepdf, the structure tree, all in a single open and save.
+    Without pikepdf only the metadata and flags are written, with pypdf.
 
-    Returns True if successful, False otherwise.
+    Returns True if the structure tree was added.
     """
-    if not PIKEPDF_AVAILABLE:
-        return False
+    if PIKEPDF_AVAILABLE:
+        # Only overwriting the input in place needs an in-memory copy of it
+        same_file = Path(output_path).resolve() == Path(input_path).resolve()
+        try:
+            with pikepdf.open(input_path, allow_overwriting_input=same_file) as pdf:
+                _set_pdf_metadata(pdf, metadata)
+                _add_structure_tree(pdf, metadata)
+                pdf.save(output_path)
+            return True
+        except Exception as e:
+            print(f"Warning: Could not add structure tree with pikepdf: {e}")
 
+    _update_pdf_metadata_pypdf(input_path, output_path, metadata, reader)
+    return False
+
+
+def sample_page_texts(reader: PdfReader) -> List[str]:
+    """
+    Extract the text of the first, middle and last pages only.
+    """
+    page_count = len(reader.pages)
+    indices = sorted({0, page_count // 2, page_count - 1}) if page_count else []
+    return [reader.pages[i].extract_text() for i in indices]
+
+
+def _analysis_cache_file(pdf_path: str, *options) -> Path:
+    """
+    Cache file for the analysis of `pdf_path` with the given analyze_pdf options.
+    The key covers the file name too, since the document type can come from it.
+    """
+    stat = os.stat(pdf_path)
+    with open(pdf_path, 'rb') as f:
+        digest = hashlib.blake2b(f.read(ANALYSIS_CACHE_PREFIX), digest_size=16)
+    digest.update(json.dumps([ANALYSIS_CACHE_VERSION, stat.st_size, stat.st_mtime_ns,
+                              Path(pdf_path).name, *options]).encode('utf-8'))
+    return ANALYSIS_CACHE_DIR / f"{digest.hexdigest()}.json"
+
+
+def _load_cached_analysis(cache_file: Path) -> Optional[Dict]:
+    """
+    Return the cached analysis, or None if there is none. An unreadable or
+    malformed entry (e.g. an older layout) counts as a cache miss.
+    """
     try:
-        # Open with pikepdf
-        pdf = pikepdf.open(pdf_path, allow_overwriting_input=True)
-
-        # Add structure tree if it doesn't exist
-        if '/StructTreeRoot' not in pdf.Root:
-            # Create minimal structure tree
-            struct_tree_root = Dictionary(
-                Type=Name('/StructTreeRoot'),
-                K=Array([]),
-                ParentTree=Dictionary(Nums=Array([])),
-                RoleMap=Dictionary()
-            )
-
-            # Add Document element as root
-            document_elem = Dictionary(
-                Type=Name('/StructElem'),
-                S=Name('/Document'),
-                P=struct_tree_root,
-                K=Array([])
-            )
-
-            struct_tree_root.K.append(document_elem)
-            pdf.Root.StructTreeRoot = struct_tree_root
-
-        # Ensure MarkInfo is set
-        if '/MarkInfo' not in pdf.Root:
-            pdf.Root.MarkInfo = Dictionary()
-        pdf.Root.MarkInfo.Marked = True
-
-        # Ensure ViewerPreferences is set
-        if '/ViewerPreferences' not in pdf.Root:
-            pdf.Root.ViewerPreferences = Dictionary()
-        pdf.Root.ViewerPreferences.DisplayDocTitle = True
-
-        # Set catalog language
-        if metadata.get("language"):
-            pdf.Root.Lang = PikeString(metadata["language"])
-
-        # Update XMP metadata for better compliance
-        try:
-            with pdf.open_metadata() as meta:
-                if metadata.get("title"):
-                    meta['dc:title'] = metadata["title"]
-                if metadata.get("author"):
-                    meta['dc:creator'] = [metadata["author"]]
-                if metadata.get("subject"):
-                    meta['dc:description'] = metadata["subject"]
-                if metadata.get("keywords"):
-                    meta['pdf:Keywords'] = metadata["keywords"]
-                if metadata.get("language"):
-                    meta['dc:language'] = [metadata["language"]]
-        except Exception:
-            pass  # XMP metadata is optional
-
-        # Save changes
-        pdf.save(pdf_path)
-        pdf.close()
-        return True
+        with open(cache_file, encoding='utf-8') as f:
+            analysis = json.load(f)
+        analysis["language_probabilities"] = [tuple(lp) for lp in analysis["language_probabilities"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return analysis
 
-    except Exception as e:
-        print(f"Warning: Could not add structure tree with pikepdf: {e}")
-        return False
+
+def _save_cached_analysis(cache_file: Path, analysis: Dict) -> None:
+    """
+    Write an analysis to the cache; like the language cache, failures are
+    ignored, including a value json can't encode.
+    """
+    try:
+        # Encoded before the file is opened, so a failure leaves no partial file
+        data = json.dumps(analysis)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_file, cache_file)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def _info_text(meta: Optional[DocumentInformation], key: str) -> str:
+    """
+    A document info entry as a plain string ("" if missing). Indexing
+    resolves indirect values, which `get` would return as references.
+    """
+    return str(meta[key]) if meta and key in meta else ""
+
+
+def analysis_from_metadata(pdf_path: str, reader: PdfReader,
+                           meta: Optional[DocumentInformation]) -> Optional[Dict]:
+    """
+    Build the analysis of an already tagged PDF from its document info alone,
+    without extracting any text.
+
+    Returns None unless /Title, /Author, /Language and /Keywords are all set.
+    """
+    if not meta:
+        return None
+    title, author, keywords = meta.title, meta.author, meta.keywords
+    language = meta["/Language"] if "/Language" in meta else None
+    if not all(value and str(value).strip() for value in (title, author, language, keywords)):
+        return None
+
+    path = Path(pdf_path)
+    tags = [tag.strip() for tag in keywords.split(",") if tag.strip()]
+
+    # Keywords written by this script start with the document type and format
+    if tags and (tags[0] in DOC_TYPE_PATTERNS or tags[0] == "document"):
+        doc_type = tags[0]
+    else:
+        doc_type = classify_document_type("", path.name)
+
+    return {
+        "filename": path.name,
+        "page_count": len(reader.pages),
+        "primary_language": str(language),
+        "language_probabilities": [(str(language), 1.0)],
+        "document_type": doc_type,
+        "format": "slides" if "slides" in tags else "text-document",
+        "tags": tags,
+        "suggested_title": title.strip(),
+        "suggested_author": author.strip(),
+        "suggested_subject": meta.subject or f"{doc_type.title()} - {', '.join(tags[:3])}",
+        "suggested_keywords": keywords,
+        "existing_metadata": {
+            "title": str(title),
+            "author": str(author),
+            "subject": _info_text(meta, "/Subject"),
+            "keywords": str(keywords),
+        }
+    }
 
 
-def analyze_pdf(pdf_path: str) -> Dict:
+def analyze_pdf(pdf_path: str, reader: Optional[PdfReader] = None, fast: bool = False,
+                from_metadata: bool = False, use_cache: bool = True, parallel: bool = True) -> Dict:
     """
     Main analysis function that returns all metadata.
+    Pass a `reader` to reuse an already parsed PDF.
+
+    With `fast`, language, document type and tags come from a sample of
+    FAST_SAMPLE_PAGES pages instead of the full text. With `from_metadata`,
+    a PDF whose title, author, language and keywords are already set is
+    not analyzed at all; see analysis_from_metadata.
+
+    Results are cached on disk by file fingerprint (see ANALYSIS_CACHE_DIR);
+    pass `use_cache=False` to neither read nor write the caches.
+    With `parallel=False` the text is extracted on this process only, for
+    callers that already run one worker process per CPU.
+    """
+    if not (use_cache and CACHE_ENABLED):
+        return _analyze_pdf(pdf_path, reader, fast, from_metadata, False, parallel)
+
+    cache_file = _analysis_cache_file(pdf_path, fast, from_metadata)
+    analysis = _load_cached_analysis(cache_file)
+    if analysis is None:
+        analysis = _analyze_pdf(pdf_path, reader, fast, from_metadata, True, parallel)
+        _save_cached_analysis(cache_file, analysis)
+    return analysis
+
+
+def _analyze_pdf(pdf_path: str, reader: Optional[PdfReader], fast: bool, from_metadata: bool,
+                 use_cache: bool = True, parallel: bool = True) -> Dict:
+    """
+    analyze_pdf without the cache.
     """
     path = Path(pdf_path)
 
+    # The PDF is parsed once; every pass below shares this reader
+    if reader is None:
+        reader = PdfReader(pdf_path)
+
+    # pypdf rebuilds the document info on every reader.metadata access, so it is read once here
+    meta = reader.metadata
+    if from_metadata:
+        analysis = analysis_from_metadata(pdf_path, reader, meta)
+        if analysis is not None:
+            return analysis
+
     # Extract text and analyze structure
-    text, page_count, is_slides = extract_text_from_pdf(pdf_path)
+    page_count = len(reader.pages)
+    word_count = None
+    if fast and page_count > FAST_SAMPLE_PAGES:
+        text_per_page = sample_page_texts(reader)
+        text, page_count, is_slides = summarize_page_text(text_per_page, page_count)
+        # Scale the sample's words up to the whole document for the length tags;
+        # the sample's own limit scales down the same way
+        sample_limit = COMPREHENSIVE_WORDS * len(text_per_page) // page_count + 1
+        word_count = _count_words(text, sample_limit) * page_count // len(text_per_page)
+    else:
+        text_per_page = extract_page_texts(reader, pdf_path, parallel)
+        text, page_count, is_slides = summarize_page_text(text_per_page)
+    first_page_text = text_per_page[0] if text_per_page else None
+    del text_per_page
 
-    # Detect language
-    primary_lang, lang_probs = detect_language(text)
+    # Detect language from the first LANGUAGE_SAMPLE_CHARS characters
+    primary_lang, lang_probs = detect_language(text[:LANGUAGE_SAMPLE_CHARS], use_cache)
 
     # Classify document type
     doc_type = classify_document_type(text, path.name)
 
     # Generate tags
-    tags = generate_content_tags(text, doc_type, is_slides)
+    tags = generate_content_tags(text, doc_type, is_slides, word_count)
 
     # Extract title and author
-    reader = PdfReader(pdf_path)
-    title = extract_title_from_pdf(reader, text)
-    author = extract_author_from_pdf(reader)
-
-    # Get existing metadata
-    existing_meta = reader.metadata if reader.metadata else {}
+    title = extract_title_from_pdf(reader, text, first_page_text, meta)
+    author = extract_author_from_pdf(reader, first_page_text, meta)
 
     return {
         "filename": path.name,
@@ -506,28 +949,168 @@ def analyze_pdf(pdf_path: str) -> Dict:
         "suggested_subject": f"{doc_type.title()} - {', '.join(tags[:3])}",
         "suggested_keywords": ", ".join(tags),
         "existing_metadata": {
-            "title": existing_meta.get("/Title", ""),
-            "author": existing_meta.get("/Author", ""),
-            "subject": existing_meta.get("/Subject", ""),
-            "keywords": existing_meta.get("/Keywords", ""),
+            "title": _info_text(meta, "/Title"),
+            "author": _info_text(meta, "/Author"),
+            "subject": _info_text(meta, "/Subject"),
+            "keywords": _info_text(meta, "/Keywords"),
         }
     }
 
 
+def tagged_output_path(pdf_path: str, output_dir: Optional[str] = None) -> str:
+    """
+    Default output path for a tagged PDF: <stem>_tagged.pdf, next to the
+    input unless `output_dir` is given.
+    """
+    path = Path(pdf_path)
+    parent = Path(output_dir) if output_dir else path.parent
+    return str(parent / f"{path.stem}_tagged{path.suffix}")
+
+
+def metadata_from_analysis(analysis: Dict) -> Dict:
+    """
+    Metadata to write for an analyzed PDF.
+    """
+    return {
+        "title": analysis['suggested_title'],
+        "author": analysis['suggested_author'],
+        "subject": analysis['suggested_subject'],
+        "keywords": analysis['suggested_keywords'],
+        "language": analysis['primary_language'],
+    }
+
+
+def wants_fast_analysis(reader: PdfReader, fast: bool, analyze_only: bool) -> bool:
+    """
+    Sample pages if asked to, or when only analyzing a long document.
+    """
+    return fast or (analyze_only and len(reader.pages) > FAST_AUTO_PAGES)
+
+
+def _take_language_entries() -> Dict:
+    """
+    Return the language cache entries queued so far and clear the queue.
+    """
+    entries = dict(_new_language_entries)
+    _new_language_entries.clear()
+    return entries
+
+
+def _process_batch_file(pdf_path: str, output_dir: Optional[str], analyze_only: bool,
+                        fast: bool = False, use_cache: bool = True) -> Tuple[Optional[Dict], Optional[str], Dict]:
+    """
+    Batch worker: analyze one PDF and, unless `analyze_only`, write its tagged copy.
+    Returns (analysis, error, language cache entries); the analysis records
+    'output_path' if a copy was written. Worker processes exit without running
+    atexit handlers, so their new language cache entries go back to the parent,
+    which writes them once.
+    """
+    try:
+        reader = PdfReader(pdf_path)
+        # Batch workers already run one per CPU; extracting pages in further
+        # worker processes inside them would only oversubscribe the machine
+        analysis = analyze_pdf(pdf_path, reader, wants_fast_analysis(reader, fast, analyze_only), analyze_only,
+                               use_cache, parallel=False)
+
+        if not analyze_only:
+            output_path = tagged_output_path(pdf_path, output_dir)
+            metadata = metadata_from_analysis(analysis)
+            write_tagged_pdf(pdf_path, output_path, metadata, reader)
+            analysis['output_path'] = output_path
+
+        return analysis, None, _take_language_entries()
+    except Exception as e:
+        return None, str(e), _take_language_entries()
+
+
+def run_batch(directory: str, output_dir: Optional[str] = None, analyze_only: bool = False,
+              as_json: bool = False, fast: bool = False, use_cache: bool = True) -> bool:
+    """
+    Analyze (and tag) every PDF in a directory, one worker process per CPU.
+    Running in one invocation pays interpreter startup and the langdetect
+    profile load once per worker instead of once per file.
+
+    Returns True if every file was processed.
+    """
+    # Skip the outputs of an earlier run
+    pdf_paths = sorted(str(p) for p in Path(directory).glob('*.pdf') if not p.stem.endswith('_tagged'))
+    if not pdf_paths:
+        print(f"No PDF files found in: {directory}")
+        return False
+
+    if output_dir and not analyze_only:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    workers = min(os.cpu_count() or 1, len(pdf_paths))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_process_batch_file, pdf_path, output_dir, analyze_only, fast, use_cache): pdf_path
+                   for pdf_path in pdf_paths}
+
+        done = as_completed(futures)
+        if TQDM_AVAILABLE and not as_json:
+            done = tqdm(done, total=len(futures), unit="pdf")
+
+        for future in done:
+            analysis, error, language_entries = future.result()
+            results[futures[future]] = (analysis, error)
+            _record_language_entries(language_entries)
+
+    if as_json:
+        print(json.dumps([analysis or {"filename": Path(pdf_path).name, "error": error}
+                          for pdf_path, (analysis, error) in sorted(results.items())], indent=2))
+    else:
+        print(f"\n{'='*60}")
+        print(f"Batch results: {directory}")
+        print(f"{'='*60}\n")
+        for pdf_path, (analysis, error) in sorted(results.items()):
+            name = Path(pdf_path).name
+            if error:
+                print(f"  [FAIL] {name}: {error}")
+            else:
+                summary = f"{analysis['document_type']}, {analysis['primary_language']}, {analysis['page_count']} pages"
+                if 'output_path' in analysis:
+                    summary += f" -> {analysis['output_path']}"
+                print(f"  [OK] {name}: {summary}")
+
+    return all(error is None for _, error in results.values())
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Analyze PDF and update metadata for accessibility"
     )
-    parser.add_argument("pdf_path", help="Path to the PDF file")
+    # One PDF file or a --batch directory, not both
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("pdf_path", nargs="?", help="Path to the PDF file")
     parser.add_argument(
         "--output", "-o",
-        help="Output path for tagged PDF (default: <original>_tagged.pdf)"
+        help="Output path for tagged PDF (default: <original>_tagged.pdf); "
+             "with --batch, the output directory"
+    )
+    source.add_argument(
+        "--batch", "-b",
+        metavar="DIR",
+        help="Process every PDF in DIR, in parallel"
     )
     parser.add_argument(
         "--analyze-only", "-a",
         action="store_true",
         help="Only analyze and print metadata, don't create output file"
     )
+    parser.add_argument(
+        "--fast", "-f",
+        action="store_true",
+        help=f"Analyze only the first, middle and last pages (default with --analyze-only "
+             f"above {FAST_AUTO_PAGES} pages)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the analysis and language caches "
+             "(or set PDF_ACCESSIBILITY_NO_CACHE)"
+    )
     parser.add_argument(
         "--json", "-j",
         action="store_true",
@@ -536,12 +1119,24 @@ def main():
 
     args = parser.parse_args()
 
+    if args.batch:
+        if not Path(args.batch).is_dir():
+            print(f"Error: Directory not found: {args.batch}")
+            sys.exit(1)
+        success = run_batch(args.batch, args.output, args.analyze_only, args.json, args.fast,
+                            not args.no_cache)
+        sys.exit(0 if success else 1)
+
     if not Path(args.pdf_path).exists():
         print(f"Error: File not found: {args.pdf_path}")
         sys.exit(1)
 
-    # Analyze PDF
-    analysis = analyze_pdf(args.pdf_path)
+    # Analyze PDF (the parsed PDF is reused when writing the output)
+    reader = PdfReader(args.pdf_path)
+    fast = wants_fast_analysis(reader, args.fast, args.analyze_only)
+    if fast and len(reader.pages) > FAST_SAMPLE_PAGES and not args.json:
+        print(f"Fast analysis: sampling {FAST_SAMPLE_PAGES} of {len(reader.pages)} pages")
+    analysis = analyze_pdf(args.pdf_path, reader, fast, args.analyze_only, not args.no_cache)
 
     # Output results
     if args.json:
@@ -568,26 +1163,15 @@ def main():
 
     # Update PDF if requested
     if not args.analyze_only:
-        output_path = args.output
-        if not output_path:
-            path = Path(args.pdf_path)
-            output_path = str(path.parent / f"{path.stem}_tagged{path.suffix}")
-
-        metadata = {
-            "title": analysis['suggested_title'],
-            "author": analysis['suggested_author'],
-            "subject": analysis['suggested_subject'],
-            "keywords": analysis['suggested_keywords'],
-            "language": analysis['primary_language'],
-        }
+        output_path = args.output or tagged_output_path(args.pdf_path)
+        metadata = metadata_from_analysis(analysis)
 
-        update_pdf_metadata(args.pdf_path, output_path, metadata)
+        # Metadata and structure tree are written in one pass with pikepdf (if available)
+        if PIKEPDF_AVAILABLE and not args.json:
+            print("\nEnhancing with structure tree...")
+        success = write_tagged_pdf(args.pdf_path, output_path, metadata, reader)
 
-        # Enhance with structure tree using pikepdf (if available)
         if PIKEPDF_AVAILABLE:
-            if not args.json:
-                print("\nEnhancing with structure tree...")
-            success = add_structure_tree_with_pikepdf(output_path, metadata)
             if success and not args.json:
                 print("  Structure tree added successfully")
         else:
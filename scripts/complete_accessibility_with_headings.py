@@ -23,20 +23,14 @@ Usage:
 """
 
 import sys
-import json
+import asyncio
 import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-try:
-    from analyze_and_tag_pdf import analyze_pdf
-    from add_alt_text_to_images import extract_images_from_pdf, add_alt_text_auto, add_alt_text_interactive, add_alt_text_from_file
-    from add_heading_tags import extract_text_with_fonts, identify_headings, load_manual_headings
-except ImportError as e:
-    print(f"Error importing scripts: {e}")
-    sys.exit(1)
-
 try:
     import pikepdf
     from pikepdf import Dictionary, Array, Name, String
@@ -45,6 +39,53 @@ except ImportError:
     sys.exit(1)
 
 
+def _heading_elements(headings: list, document_elem) -> list:
+    """
+    Build the heading (H1-H6) structure elements, children of document_elem.
+    """
+    from add_heading_tags import heading_type
+
+    # Heading elements stay direct objects: only the Document element they
+    # point back to must be indirect. Empty /K arrays are created per element:
+    # pikepdf does not copy an Array when it is stored, so a shared one would
+    # be aliased by every element
+    print(f"Adding {len(headings)} heading elements...")
+    return [
+        Dictionary(
+            Type=Name.StructElem,
+            S=heading_type(heading['level']),
+            P=document_elem,
+            K=Array([]),
+            T=String(heading['text'])
+        )
+        for heading in headings
+    ]
+
+
+def _image_elements(images_with_alt: list, document_elem) -> list:
+    """
+    Build Figure elements for images with alt text. Decorative images get
+    none: they are left out of the structure tree.
+    """
+    figures = [
+        Dictionary(
+            Type=Name.StructElem,
+            S=Name.Figure,
+            P=document_elem,
+            Alt=String(img['alt_text']),
+            K=Array([])
+        )
+        for img in images_with_alt if img.get('alt_text')
+    ]
+
+    print(f"Adding {len(figures)} Figure elements with alt text...")
+    decorative = sum(1 for img in images_with_alt if img.get('decorative'))
+    if decorative:
+        print(f"Leaving {decorative} decorative images out of the structure tree...")
+
+    return figures
+
+
 def create_complete_structure_tree(pdf, headings: list, images_with_alt: list, metadata: dict):
     """
     Create a complete structure tree with both headings and figures.
@@ -73,44 +114,40 @@ def create_complete_structure_tree(pdf, headings: list, images_with_alt: list, m
 
     struct_tree_root.K = Array([document_elem])
 
-    # Add heading elements
-    print(f"Adding {len(headings)} heading elements...")
-    for heading in headings:
-        level = min(heading['level'], 6)
-        heading_tag = Name(f'/H{level}')
+    # Children are collected in a list and attached with one assignment.
+    # Without images (e.g. --skip-images) only the headings are built
+    elements = _heading_elements(headings, document_elem)
+    if images_with_alt:
+        elements += _image_elements(images_with_alt, document_elem)
 
-        heading_elem = pdf.make_indirect(Dictionary(
-            Type=Name.StructElem,
-            S=heading_tag,
-            P=document_elem,
-            K=Array([]),
-            T=String(heading['text'])
-        ))
-
-        document_elem.K.append(heading_elem)
-
-    # Add figure elements with alt text
-    images_with_alt_text = [img for img in images_with_alt if img.get('alt_text')]
-    print(f"Adding {len(images_with_alt_text)} Figure elements with alt text...")
-
-    for img in images_with_alt_text:
-        figure_elem = pdf.make_indirect(Dictionary(
-            Type=Name.StructElem,
-            S=Name.Figure,
-            P=document_elem,
-            Alt=String(img['alt_text']),
-            K=Array([])
-        ))
+    document_elem.K = Array(elements)
 
-        document_elem.K.append(figure_elem)
-
-    print(f"Total structure elements: {len(document_elem.K)}")
+    print(f"Total structure elements: {len(elements)}")
 
 
 def run_complete_accessibility(input_pdf, output_pdf, args):
     """
     Run complete accessibility enhancement with headings and alt text.
     """
+    # The other scripts pull in pypdf, langdetect and anthropic, so they are
+    # only imported once there is work to do (not for --help)
+    try:
+        from analyze_and_tag_pdf import analyze_pdf
+        from add_alt_text_to_images import extract_images_from_pdf, add_alt_text_auto_async, add_alt_text_interactive, add_alt_text_from_file
+        from add_heading_tags import (extract_text_with_fonts, read_page_lines, identify_headings,
+                                      load_manual_headings, PYMUPDF_AVAILABLE, PARALLEL_FONT_MIN_PAGES,
+                                      HEADING_TYPES)
+        from enhance_pdf_accessibility import write_document_metadata, get_nested
+    except ImportError as e:
+        print(f"Error importing scripts: {e}")
+        sys.exit(1)
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        print("Error: pypdf not installed. Run: pip install pypdf")
+        sys.exit(1)
+
     print("="*70)
     print("COMPLETE PDF ACCESSIBILITY ENHANCEMENT")
     print("With Headings and Alt Text")
@@ -121,48 +158,70 @@ def run_complete_accessibility(input_pdf, output_pdf, args):
     # Step 1: Analyze content
     print("STEP 1: Analyzing PDF content...")
     print("-"*70)
-    analysis = analyze_pdf(input_pdf)
+
+    # The PDF is parsed once for text; analysis and heading detection share this reader
+    reader = PdfReader(input_pdf)
+    analysis = analyze_pdf(input_pdf, reader)
 
     print(f"  Type: {analysis['document_type']}")
     print(f"  Language: {analysis['primary_language']}")
     print(f"  Title: {analysis['suggested_title']}")
     print(f"  Author: {analysis['suggested_author'] or '(not detected)'}")
 
-    # Step 2: Extract and process images
-    images = []
-    if not args.skip_images:
-        print("\nSTEP 2: Processing images...")
-        print("-"*70)
-        images = extract_images_from_pdf(input_pdf)
-
-        if images:
-            if args.auto_alt_text:
-                images = add_alt_text_auto(images)
-            elif args.interactive_alt_text:
-                images = add_alt_text_interactive(images)
-            elif args.alt_text_file:
-                images = add_alt_text_from_file(images, args.alt_text_file)
+    # The PDF is opened once; image extraction and the final save share it
+    pdf = pikepdf.open(input_pdf, access_mode=pikepdf.AccessMode.mmap)
+
+    # While the alt text requests wait on the network, the text lines for
+    # heading detection are read on a second thread; only it uses the reader
+    # from here on. That is only done where they are read on one process
+    # (PyMuPDF, or a short document): forking worker processes while the alt
+    # text threads run could deadlock them, so long documents read by pypdf
+    # wait for step 3 and its worker processes
+    read_fonts_early = (args.auto_alt_text and not args.headings_file
+                        and (PYMUPDF_AVAILABLE or len(reader.pages) < PARALLEL_FONT_MIN_PAGES))
+
+    with ThreadPoolExecutor(max_workers=1) as fonts_executor:
+        fonts_future = None
+        if read_fonts_early:
+            fonts_future = fonts_executor.submit(read_page_lines, input_pdf, reader, parallel=False)
+
+        # Step 2: Extract and process images
+        images = []
+        if not args.skip_images:
+            print("\nSTEP 2: Processing images...")
+            print("-"*70)
+            images = extract_images_from_pdf(pdf)
+
+            if images:
+                if args.auto_alt_text:
+                    images = asyncio.run(add_alt_text_auto_async(images, args.grayscale_alt_input,
+                                                                  args.skip_decorative))
+                elif args.interactive_alt_text:
+                    images = add_alt_text_interactive(images)
+                elif args.alt_text_file:
+                    images = add_alt_text_from_file(images, args.alt_text_file)
+            else:
+                print("  No images found")
         else:
-            print("  No images found")
-    else:
-        print("\nSTEP 2: Skipping image processing (--skip-images)")
+            print("\nSTEP 2: Skipping image processing (--skip-images)")
+
+        page_lines = fonts_future.result() if fonts_future is not None else None
 
-    # Step 3: Detect headings
+    # Step 3: Detect headings (the lines may have been read above; the
+    # progress output is printed here, in order)
     print("\nSTEP 3: Detecting headings...")
     print("-"*70)
 
     if args.headings_file:
         headings = load_manual_headings(args.headings_file)
     else:
-        text_blocks = extract_text_with_fonts(input_pdf)
+        text_blocks = extract_text_with_fonts(input_pdf, reader, page_lines)
         headings = identify_headings(text_blocks)
 
     # Step 4: Create enhanced PDF
     print("\nSTEP 4: Creating enhanced PDF...")
     print("-"*70)
 
-    pdf = pikepdf.open(input_pdf)
-
     metadata = {
         'title': analysis['suggested_title'],
         'author': analysis['suggested_author'] or '',
@@ -181,42 +240,37 @@ def run_complete_accessibility(input_pdf, output_pdf, args):
         pdf.Root.ViewerPreferences = Dictionary()
     pdf.Root.ViewerPreferences.DisplayDocTitle = True
 
-    # Set metadata
-    pdf.docinfo[Name.Title] = String(metadata['title'])
-    if metadata['author']:
-        pdf.docinfo[Name.Author] = String(metadata['author'])
-    pdf.docinfo[Name.Subject] = String(metadata['subject'])
-    pdf.docinfo[Name.Keywords] = String(metadata['keywords'])
-    pdf.Root.Lang = String(metadata['language'])
-
-    # Update XMP metadata
+    # Set metadata, in the document info and XMP
     try:
-        with pdf.open_metadata() as meta:
-            meta['dc:title'] = metadata['title']
-            if metadata['author']:
-                meta['dc:creator'] = [metadata['author']]
-            meta['dc:description'] = metadata['subject']
-            meta['pdf:Keywords'] = metadata['keywords']
-            meta['dc:language'] = [metadata['language']]
+        write_document_metadata(pdf, metadata)
         print("  XMP metadata updated")
     except Exception as e:
         print(f"  Warning: XMP update failed: {e}")
 
     # Save
+    # Pack the structure dictionaries into object streams and copy existing
+    # streams through; linearize only for page-at-a-time web viewing
     print(f"\nSaving to: {output_pdf}")
-    pdf.save(output_pdf, linearize=True)
-    pdf.close()
+    pdf.save(output_pdf, linearize=args.linearize,
+             object_stream_mode=pikepdf.ObjectStreamMode.generate,
+             compress_streams=True,
+             stream_decode_level=pikepdf.StreamDecodeLevel.none)
 
     # Verification
     print("\nSTEP 5: Verification...")
     print("-"*70)
 
-    verify_pdf = pikepdf.open(output_pdf)
+    # The in-memory PDF is what was just written; reparse the file only if asked to
+    if args.strict_verify:
+        pdf.close()
+        verify_pdf = pikepdf.open(output_pdf)
+    else:
+        verify_pdf = pdf
 
     checks = {
         'StructTreeRoot': '/StructTreeRoot' in verify_pdf.Root,
-        'Marked': verify_pdf.Root.get('/MarkInfo', {}).get('/Marked', False),
-        'DisplayDocTitle': verify_pdf.Root.get('/ViewerPreferences', {}).get('/DisplayDocTitle', False),
+        'Marked': get_nested(verify_pdf.Root, '/MarkInfo', '/Marked'),
+        'DisplayDocTitle': get_nested(verify_pdf.Root, '/ViewerPreferences', '/DisplayDocTitle'),
         'Language': '/Lang' in verify_pdf.Root,
         'Title': '/Title' in verify_pdf.docinfo
     }
@@ -230,20 +284,13 @@ def run_complete_accessibility(input_pdf, output_pdf, args):
         if '/K' in struct and len(struct.K) > 0:
             doc = struct.K[0]
             if '/K' in doc:
-                from collections import defaultdict
-                elem_count = defaultdict(int)
-
-                for elem in doc.K:
-                    if hasattr(elem, 'S'):
-                        elem_type = str(elem.S)
-                        if elem_type.startswith('/H'):
-                            elem_count['Headings'] += 1
-                        elif elem_type == '/Figure':
-                            elem_count['Figures'] += 1
+                # Count by structure type, comparing the /S names directly
+                kinds = Counter(elem.get('/S') for elem in doc.K if isinstance(elem, Dictionary))
 
                 print(f"\nStructure elements:")
-                print(f"  Headings: {elem_count['Headings']}")
-                print(f"  Figures with alt text: {elem_count['Figures']}")
+                print(f"  Headings: {sum(kinds[name] for name in HEADING_TYPES)}")
+                print(f"  Figures with alt text: {kinds[Name.Figure]}")
+                print(f"  Decorative images (untagged): {sum(1 for img in images if img.get('decorative'))}")
                 print(f"  Total: {len(doc.K)}")
 
     verify_pdf.close()
@@ -279,9 +326,19 @@ def main():
     alt_group.add_argument("--skip-images", action="store_true",
                           help="Skip image processing")
 
+    parser.add_argument("--grayscale-alt-input", action="store_true",
+                       help="With --auto-alt-text, send all images to Claude in grayscale (smaller uploads)")
+    parser.add_argument("--skip-decorative", action="store_true",
+                       help="With --auto-alt-text, leave small near-blank images (fills, rules) out without alt text")
+
     # Heading options
     parser.add_argument("--headings-file", help="JSON file with manual headings")
 
+    parser.add_argument("--linearize", action="store_true",
+                       help="Linearize output for page-at-a-time web viewing (slower to save)")
+    parser.add_argument("--strict-verify", action="store_true",
+                       help="Verify by reopening the saved file instead of checking the PDF in memory")
+
     args = parser.parse_args()
 
     if not Path(args.pdf_path).exists():
@@ -26,33 +26,34 @@ Usage:
 """
 
 import sys
-import json
+import asyncio
 import argparse
 from pathlib import Path
-import subprocess
 
 # Import from other scripts
 sys.path.insert(0, str(Path(__file__).parent))
 
-try:
-    from analyze_and_tag_pdf import analyze_pdf
-    from add_alt_text_to_images import (
-        extract_images_from_pdf,
-        add_alt_text_auto,
-        add_alt_text_interactive,
-        add_alt_text_from_file,
-        add_alt_text_to_pdf
-    )
-except ImportError as e:
-    print(f"Error importing required scripts: {e}")
-    print("Make sure all scripts are in the same directory.")
-    sys.exit(1)
-
 
 def run_complete_workflow(input_pdf, output_pdf, alt_text_mode='skip', alt_text_file=None):
     """
     Run the complete accessibility workflow.
     """
+    # The other scripts pull in pypdf, pikepdf, langdetect and anthropic, so
+    # they are only imported once there is work to do (not for --help)
+    try:
+        from analyze_and_tag_pdf import analyze_pdf
+        from add_alt_text_to_images import (
+            extract_images_from_pdf,
+            add_alt_text_auto_async,
+            add_alt_text_interactive,
+            add_alt_text_from_file,
+            add_alt_text_to_pdf
+        )
+    except ImportError as e:
+        print(f"Error importing required scripts: {e}")
+        print("Make sure all scripts are in the same directory.")
+        sys.exit(1)
+
     print("="*70)
     print("COMPLETE PDF ACCESSIBILITY WORKFLOW")
     print("="*70)
@@ -77,13 +78,15 @@ def run_complete_workflow(input_pdf, output_pdf, alt_text_mode='skip', alt_text_
         print("STEP 2: Processing images for alt text...")
         print("-"*70)
 
-        images = extract_images_from_pdf(input_pdf)
+        import pikepdf
+        pdf = pikepdf.open(input_pdf, access_mode=pikepdf.AccessMode.mmap)
+        images = extract_images_from_pdf(pdf)
 
         if not images:
             print("  No images found. Skipping image processing.")
         else:
             if alt_text_mode == 'auto':
-                images = add_alt_text_auto(images)
+                images = asyncio.run(add_alt_text_auto_async(images))
             elif alt_text_mode == 'interactive':
                 images = add_alt_text_interactive(images)
             elif alt_text_mode == 'file' and alt_text_file:
@@ -100,7 +103,9 @@ def run_complete_workflow(input_pdf, output_pdf, alt_text_mode='skip', alt_text_
                 'language': analysis['primary_language']
             }
 
-            add_alt_text_to_pdf(input_pdf, output_pdf, images, metadata)
+            add_alt_text_to_pdf(pdf, output_pdf, images, metadata)
+
+        pdf.close()
 
     else:
         # No image processing - use enhance_pdf_accessibility
@@ -7,12 +7,17 @@ Use this AFTER running analyze_and_tag_pdf.py for maximum accessibility complian
 
 Requirements:
     pip install pikepdf
+    pip install "pypdf>=5.0"  # optional, for --incremental
 
 Usage:
     python enhance_pdf_accessibility.py <input.pdf> --output <output.pdf> \
         --title "Title" --author "Author" --language "en"
+
+    # Append the changes after the original bytes (e.g. to keep a signature valid)
+    python enhance_pdf_accessibility.py <input.pdf> --output <output.pdf> --incremental
 """
 
+import io
 import sys
 import argparse
 from pathlib import Path
@@ -24,43 +29,97 @@ except ImportError:
     print("Error: pikepdf is not installed. Run: pip install pikepdf")
     sys.exit(1)
 
+# Optional: pypdf can write the changes as an incremental update (--incremental).
+# PdfWriter(incremental=True) is new in pypdf 5.0
+PYPDF_AVAILABLE = False
+try:
+    import pypdf
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import BooleanObject, DictionaryObject, NameObject, TextStringObject
+    from pypdf.xmp import XmpInformation
+    PYPDF_AVAILABLE = int(pypdf.__version__.split('.')[0]) >= 5
+except (ImportError, ValueError):
+    pass
+
+
+# Document info entries and the XMP properties that mirror them; the flag
+# marks XMP properties that hold a list
+_METADATA_MAP = [
+    (Name.Title, 'title', 'dc:title', False),
+    (Name.Author, 'author', 'dc:creator', True),
+    (Name.Subject, 'subject', 'dc:description', False),
+    (Name.Keywords, 'keywords', 'pdf:Keywords', False),
+    (None, 'language', 'dc:language', True),
+]
+
+
+def write_document_metadata(pdf, metadata):
+    """
+    Write the non-empty metadata fields to the document info, the catalog
+    language and the XMP metadata, in one pass over _METADATA_MAP.
+    Raises if the XMP metadata cannot be updated (the rest is written by then).
+    """
+    fields = [(name, xmp_key, is_list, metadata[field])
+              for name, field, xmp_key, is_list in _METADATA_MAP if metadata.get(field)]
+
+    for name, _, _, value in fields:
+        if name is not None:
+            pdf.docinfo[name] = String(value)
+    if metadata.get('language'):
+        pdf.Root.Lang = String(metadata['language'])
+
+    with pdf.open_metadata() as meta:
+        for _, xmp_key, is_list, value in fields:
+            meta[xmp_key] = [value] if is_list else value
+
 
-def enhance_pdf_accessibility(input_path, output_path, metadata=None):
+def get_nested(obj, *keys, default=False):
     """
-    Enhance PDF with structure tree and full accessibility metadata.
+    Return obj[keys[0]][keys[1]]..., or `default` as soon as a key is missing.
+    Looks keys up on the pikepdf Dictionaries directly, with no dict fallbacks.
+    """
+    for key in keys:
+        if not isinstance(obj, Dictionary) or key not in obj:
+            return default
+        obj = obj[key]
+    return obj
 
-    Args:
-        input_path: Path to input PDF
-        output_path: Path to output PDF
-        metadata: Dict with title, author, subject, keywords, language
+
+def _new_structure_tree(pdf):
     """
-    if metadata is None:
-        metadata = {}
+    Create a structure tree root holding an empty Document element in `pdf`,
+    both indirect (they refer to each other). The caller attaches it.
+    """
+    struct_tree_root = pdf.make_indirect(Dictionary(
+        Type=Name.StructTreeRoot,
+        K=Array([]),
+        ParentTree=Dictionary(Nums=Array([])),
+        RoleMap=Dictionary()
+    ))
+
+    document_elem = pdf.make_indirect(Dictionary(
+        Type=Name.StructElem,
+        S=Name.Document,
+        P=struct_tree_root,
+        K=Array([])
+    ))
+
+    struct_tree_root.K = Array([document_elem])
+    return struct_tree_root
 
+
+def _enhance_with_pikepdf(input_path, output_path, metadata, linearize=False):
+    """
+    Add the structure tree and metadata with pikepdf and save the whole PDF.
+    Returns the (still open) pikepdf.Pdf that was saved.
+    """
     print(f"Opening PDF: {input_path}")
     pdf = pikepdf.open(input_path)
 
     # Add structure tree
     print("Adding structure tree...")
     if '/StructTreeRoot' not in pdf.Root:
-        # Create structure tree root
-        struct_tree_root = pdf.make_indirect(Dictionary(
-            Type=Name.StructTreeRoot,
-            K=Array([]),
-            ParentTree=Dictionary(Nums=Array([])),
-            RoleMap=Dictionary()
-        ))
-
-        # Create document element
-        document_elem = pdf.make_indirect(Dictionary(
-            Type=Name.StructElem,
-            S=Name.Document,
-            P=struct_tree_root,
-            K=Array([])
-        ))
-
-        struct_tree_root.K.append(document_elem)
-        pdf.Root.StructTreeRoot = struct_tree_root
+        pdf.Root.StructTreeRoot = _new_structure_tree(pdf)
         print("  [OK] Structure tree added")
     else:
         print("  [OK] Structure tree already exists")
@@ -77,56 +136,140 @@ def enhance_pdf_accessibility(input_path, output_path, metadata=None):
     pdf.Root.ViewerPreferences.DisplayDocTitle = True
     print("  [OK] DisplayDocTitle = True")
 
-    # Set metadata
+    # Set metadata, in the document info and XMP
     if metadata.get('language'):
         print(f"Setting language: {metadata['language']}")
-        pdf.Root.Lang = String(metadata['language'])
-
     if metadata.get('title'):
         print(f"Setting title: {metadata['title']}")
-        pdf.docinfo[Name.Title] = String(metadata['title'])
-
     if metadata.get('author'):
         print(f"Setting author: {metadata['author']}")
-        pdf.docinfo[Name.Author] = String(metadata['author'])
 
-    if metadata.get('subject'):
-        pdf.docinfo[Name.Subject] = String(metadata['subject'])
+    print("Updating XMP metadata...")
+    try:
+        write_document_metadata(pdf, metadata)
+        print("  [OK] XMP metadata updated")
+    except Exception as e:
+        print(f"  [WARNING] XMP metadata update failed: {e}")
+
+    # Save. Existing streams are copied through undecoded (no recompression),
+    # content streams are not normalized, and only the small dictionaries are
+    # repacked into new object streams, which is both smaller and no slower
+    # than preserving the input's object streams
+    print(f"\nSaving to: {output_path}")
+    pdf.save(output_path, linearize=linearize,
+             object_stream_mode=pikepdf.ObjectStreamMode.generate,
+             compress_streams=True,
+             stream_decode_level=pikepdf.StreamDecodeLevel.none)
+
+    return pdf
 
-    if metadata.get('keywords'):
-        pdf.docinfo[Name.Keywords] = String(metadata['keywords'])
 
-    # Update XMP metadata
+def _enhance_incremental(input_path, output_path, metadata):
+    """
+    Add the structure tree and metadata as an incremental update with pypdf:
+    the output is the input file, byte for byte, followed by the changed
+    objects and a new cross-reference section.
+    """
+    print(f"Opening PDF: {input_path}")
+    writer = PdfWriter(input_path, incremental=True)
+    root = writer.root_object
+
+    print("Adding structure tree...")
+    if '/StructTreeRoot' not in root:
+        # The structure tree root and Document element must be indirect, and
+        # pypdf has no public call that adds a new indirect object. So the
+        # tree is built with pikepdf in an empty PDF and cloned in: cloning
+        # an indirect object gives it a new number in the writer
+        template = pikepdf.new()
+        template.Root.StructTreeRoot = _new_structure_tree(template)
+        buf = io.BytesIO()
+        template.save(buf)
+        struct_tree_root = PdfReader(buf).root_object['/StructTreeRoot'].clone(writer)
+        root[NameObject('/StructTreeRoot')] = struct_tree_root.indirect_reference
+        print("  [OK] Structure tree added")
+    else:
+        print("  [OK] Structure tree already exists")
+
+    print("Setting MarkInfo and ViewerPreferences...")
+    root[NameObject('/MarkInfo')] = DictionaryObject({NameObject('/Marked'): BooleanObject(True)})
+    viewer_prefs = root.get('/ViewerPreferences')
+    if viewer_prefs is None:
+        viewer_prefs = root[NameObject('/ViewerPreferences')] = DictionaryObject()
+    viewer_prefs.get_object()[NameObject('/DisplayDocTitle')] = BooleanObject(True)
+
+    if metadata.get('language'):
+        print(f"Setting language: {metadata['language']}")
+        root[NameObject('/Lang')] = TextStringObject(metadata['language'])
+
+    writer.add_metadata({name: metadata[field]
+                         for name, field, _, _ in _METADATA_MAP if name is not None and metadata.get(field)})
+
     print("Updating XMP metadata...")
     try:
-        with pdf.open_metadata() as meta:
-            if metadata.get('title'):
-                meta['dc:title'] = metadata['title']
-            if metadata.get('author'):
-                meta['dc:creator'] = [metadata['author']]
-            if metadata.get('subject'):
-                meta['dc:description'] = metadata['subject']
-            if metadata.get('keywords'):
-                meta['pdf:Keywords'] = metadata['keywords']
-            if metadata.get('language'):
-                meta['dc:language'] = [metadata['language']]
+        xmp = writer.xmp_metadata or XmpInformation.create()
+        if metadata.get('title'):
+            xmp.dc_title = {'x-default': metadata['title']}
+        if metadata.get('author'):
+            xmp.dc_creator = [metadata['author']]
+        if metadata.get('subject'):
+            xmp.dc_description = {'x-default': metadata['subject']}
+        if metadata.get('keywords'):
+            xmp.pdf_keywords = metadata['keywords']
+        if metadata.get('language'):
+            xmp.dc_language = [metadata['language']]
+        writer.xmp_metadata = xmp
         print("  [OK] XMP metadata updated")
     except Exception as e:
         print(f"  [WARNING] XMP metadata update failed: {e}")
 
-    # Save
-    print(f"\nSaving to: {output_path}")
-    pdf.save(output_path, linearize=True)
-    pdf.close()
+    print(f"\nSaving incremental update to: {output_path}")
+    writer.write(output_path)
 
-    # Verify
+
+def enhance_pdf_accessibility(input_path, output_path, metadata=None, strict_verify=False,
+                              linearize=False, incremental=False):
+    """
+    Enhance PDF with structure tree and full accessibility metadata.
+
+    Args:
+        input_path: Path to input PDF
+        output_path: Path to output PDF
+        metadata: Dict with title, author, subject, keywords, language
+        strict_verify: Verify by reopening the saved file instead of
+            checking the PDF in memory
+        linearize: Linearize the output, only for PDFs served over the web
+        incremental: Append the changes after the input's bytes (needs pypdf)
+            instead of rewriting the file. Existing signatures stay valid,
+            but it is not faster: pikepdf copies streams through unchanged
+    """
+    if metadata is None:
+        metadata = {}
+
+    if incremental and not PYPDF_AVAILABLE:
+        print("Warning: --incremental needs pypdf 5.0 or later (pip install \"pypdf>=5.0\"); saving the whole file")
+        incremental = False
+    if incremental and linearize:
+        print("Warning: an incremental update can't be linearized; ignoring --linearize")
+
+    if incremental:
+        _enhance_incremental(input_path, output_path, metadata)
+        pdf = None
+    else:
+        pdf = _enhance_with_pikepdf(input_path, output_path, metadata, linearize)
+
+    # Verify (the in-memory PDF is what was just written)
     print("\nVerifying accessibility features...")
-    verify_pdf = pikepdf.open(output_path)
+    if pdf is None or strict_verify:
+        if pdf is not None:
+            pdf.close()
+        verify_pdf = pikepdf.open(output_path)
+    else:
+        verify_pdf = pdf
 
     checks = {
         'StructTreeRoot': '/StructTreeRoot' in verify_pdf.Root,
-        'Marked': verify_pdf.Root.get('/MarkInfo', {}).get('/Marked', False),
-        'DisplayDocTitle': verify_pdf.Root.get('/ViewerPreferences', {}).get('/DisplayDocTitle', False),
+        'Marked': get_nested(verify_pdf.Root, '/MarkInfo', '/Marked'),
+        'DisplayDocTitle': get_nested(verify_pdf.Root, '/ViewerPreferences', '/DisplayDocTitle'),
         'Lang': '/Lang' in verify_pdf.Root
     }
 
@@ -159,6 +302,13 @@ def main():
     parser.add_argument("--subject", help="Document subject")
     parser.add_argument("--keywords", help="Document keywords")
     parser.add_argument("--language", default="en", help="Document language (ISO 639-1)")
+    parser.add_argument("--linearize", action="store_true",
+                        help="Linearize output for page-at-a-time web viewing (slower to save)")
+    parser.add_argument("--strict-verify", action="store_true",
+                        help="Verify by reopening the saved file instead of checking the PDF in memory")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Append the changes after the original bytes instead of rewriting "
+                             "the file, e.g. to keep a signature valid (needs pypdf)")
 
     args = parser.parse_args()
 
@@ -182,7 +332,8 @@ def main():
     # Remove None values
     metadata = {k: v for k, v in metadata.items() if v is not None}
 
-    success = enhance_pdf_accessibility(args.pdf_path, output_path, metadata)
+    success = enhance_pdf_accessibility(args.pdf_path, output_path, metadata, args.strict_verify,
+                                        args.linearize, args.incremental)
     sys.exit(0 if success else 1)
 
 
@@ -0,0 +1,108 @@
+"""
+Tests for the batch reply parser, image signatures and batching of
+add_alt_text_to_images.py.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from PIL import Image, ImageDraw
+
+from add_alt_text_to_images import (_parse_batch_alt_texts, _image_signature, _make_batches,
+                                    HASH_MAX_DISTANCE, DECORATIVE_ENTROPY, BATCH_MAX_EDGE, BATCH_SIZE)
+
+
+def drawing(size=(400, 300)):
+    """
+    A picture with some structure: shapes on a gradient.
+    """
+    image = Image.linear_gradient('L').resize(size).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    w, h = size
+    draw.ellipse((w * 0.1, h * 0.1, w * 0.5, h * 0.6), fill=(200, 30, 30))
+    draw.rectangle((w * 0.6, h * 0.5, w * 0.9, h * 0.9), fill=(20, 40, 180))
+    draw.line((0, h - 1, w - 1, 0), fill=(255, 255, 255), width=max(1, w // 50))
+    return image
+
+
+def distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class ParseBatchAltTextsTest(unittest.TestCase):
+
+    def test_plain_array(self):
+        self.assertEqual(_parse_batch_alt_texts('["A cat.", " A dog. "]', 2), ["A cat.", "A dog."])
+
+    def test_array_with_surrounding_text(self):
+        reply = 'Here are the descriptions:\n```json\n["A chart.", "A map.", "A logo."]\n```'
+        self.assertEqual(_parse_batch_alt_texts(reply, 3), ["A chart.", "A map.", "A logo."])
+
+    def test_malformed_replies(self):
+        for reply in ('', 'No images could be described.', '["A cat.", "A dog."',
+                      '["A cat."] and ["A dog."]', '{"1": "A cat.", "2": "A dog."}'):
+            with self.subTest(reply=reply):
+                self.assertIsNone(_parse_batch_alt_texts(reply, 2))
+
+    def test_wrong_count(self):
+        self.assertIsNone(_parse_batch_alt_texts('["A cat."]', 2))
+        self.assertIsNone(_parse_batch_alt_texts('["A cat.", "A dog.", "A bird."]', 2))
+
+    def test_non_string_items(self):
+        self.assertIsNone(_parse_batch_alt_texts('["A cat.", null]', 2))
+        self.assertIsNone(_parse_batch_alt_texts('["A cat.", ["A dog."]]', 2))
+
+
+class ImageSignatureTest(unittest.TestCase):
+
+    def signature(self, pil_image):
+        return _image_signature({'pil_image': pil_image})
+
+    def test_rescaled_copy_matches(self):
+        original, _ = self.signature(drawing((800, 600)))
+        rescaled, _ = self.signature(drawing((800, 600)).resize((400, 300), Image.LANCZOS))
+        self.assertLessEqual(distance(original, rescaled), HASH_MAX_DISTANCE)
+
+    def test_different_images_do_not_match(self):
+        first, _ = self.signature(drawing())
+        second, _ = self.signature(drawing().transpose(Image.FLIP_LEFT_RIGHT))
+        self.assertGreater(distance(first, second), HASH_MAX_DISTANCE)
+
+    def test_entropy(self):
+        _, flat = self.signature(Image.new('RGB', (300, 200), (40, 90, 160)))
+        _, detailed = self.signature(drawing())
+        self.assertLess(flat, DECORATIVE_ENTROPY)
+        self.assertGreater(detailed, DECORATIVE_ENTROPY)
+
+
+class MakeBatchesTest(unittest.TestCase):
+
+    def image(self, id, width, height):
+        return {'id': id, 'width': width, 'height': height}
+
+    def test_small_images_are_batched_by_width(self):
+        images = [self.image(i, 200 - 10 * i, 50) for i in range(1, BATCH_SIZE + 2)]
+        images.append(self.image(99, BATCH_MAX_EDGE + 1, 100))
+        singles, batches = _make_batches(images)
+
+        self.assertEqual([img['id'] for img in singles], [99, 1])
+        self.assertEqual(len(batches), 1)
+        widths = [img['width'] for img in batches[0]]
+        self.assertEqual(widths, sorted(widths))
+
+    def test_every_image_is_sent_once(self):
+        images = [self.image(i, (i * 37) % 400 + 10, 40) for i in range(1, 30)]
+        singles, batches = _make_batches(images)
+        sent = [img['id'] for img in singles] + [img['id'] for batch in batches for img in batch]
+        self.assertEqual(sorted(sent), list(range(1, 30)))
+        self.assertTrue(all(1 < len(batch) <= BATCH_SIZE for batch in batches))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests for the analysis cache of analyze_and_tag_pdf.py.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import atexit
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import pikepdf
+from pikepdf import Dictionary, Name, String
+
+import analyze_and_tag_pdf
+
+TEXT = ("Introduction to thermodynamics. This lecture covers the first law, "
+        "energy conservation and the behaviour of ideal gases in closed systems.")
+
+
+def make_pdf(path, pages=2, indirect_info=True):
+    """
+    Write a small PDF with one line of text per page. With `indirect_info`,
+    /Title and /Author are indirect objects, as some producers write them.
+    """
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(Dictionary(Type=Name.Font, Subtype=Name.Type1, BaseFont=Name.Helvetica))
+    for _ in range(pages):
+        pdf.add_blank_page()
+        page = pdf.pages[-1]
+        page.Resources = Dictionary(Font=Dictionary(F1=font))
+        page.Contents = pdf.make_stream(f"BT /F1 12 Tf 72 720 Td ({TEXT}) Tj ET".encode('ascii'))
+
+    title, author = String("Thermodynamics"), String("A. Lecturer")
+    if indirect_info:
+        title, author = pdf.make_indirect(title), pdf.make_indirect(author)
+    pdf.docinfo[Name.Title] = title
+    pdf.docinfo[Name.Author] = author
+    pdf.save(path)
+
+
+class AnalysisCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.saved = (analyze_and_tag_pdf.ANALYSIS_CACHE_DIR, analyze_and_tag_pdf.LANGUAGE_CACHE_FILE,
+                      analyze_and_tag_pdf.CACHE_ENABLED)
+        analyze_and_tag_pdf.ANALYSIS_CACHE_DIR = self.dir / "cache" / "analysis"
+        analyze_and_tag_pdf.LANGUAGE_CACHE_FILE = self.dir / "cache" / "langcache.json"
+        analyze_and_tag_pdf.CACHE_ENABLED = True
+        self.pdf_path = str(self.dir / "notes.pdf")
+        make_pdf(self.pdf_path)
+
+    def tearDown(self):
+        # The language cache is written at exit; keep it out of the real cache
+        atexit.unregister(analyze_and_tag_pdf._save_language_cache)
+        analyze_and_tag_pdf._new_language_entries.clear()
+        analyze_and_tag_pdf._language_cache = None
+        (analyze_and_tag_pdf.ANALYSIS_CACHE_DIR, analyze_and_tag_pdf.LANGUAGE_CACHE_FILE,
+         analyze_and_tag_pdf.CACHE_ENABLED) = self.saved
+        self.tmp.cleanup()
+
+    def cache_files(self):
+        return sorted(analyze_and_tag_pdf.ANALYSIS_CACHE_DIR.glob("*.json"))
+
+    def test_round_trip_with_indirect_metadata(self):
+        analysis = analyze_and_tag_pdf.analyze_pdf(self.pdf_path)
+        self.assertEqual(analysis["existing_metadata"]["title"], "Thermodynamics")
+        self.assertIs(type(analysis["existing_metadata"]["author"]), str)
+        self.assertEqual(len(self.cache_files()), 1)
+
+        cached = analyze_and_tag_pdf.analyze_pdf(self.pdf_path)
+        self.assertEqual(cached, analysis)
+
+    def test_round_trip_from_metadata(self):
+        # Keywords and language complete the document info, so nothing is extracted
+        pdf = pikepdf.open(self.pdf_path, allow_overwriting_input=True)
+        pdf.docinfo[Name.Keywords] = pdf.make_indirect(String("lecture, slides"))
+        pdf.docinfo[Name("/Language")] = String("en")
+        pdf.save(self.pdf_path)
+        pdf.close()
+
+        analysis = analyze_and_tag_pdf.analyze_pdf(self.pdf_path, from_metadata=True)
+        self.assertEqual(analysis["existing_metadata"]["keywords"], "lecture, slides")
+        self.assertEqual(analyze_and_tag_pdf.analyze_pdf(self.pdf_path, from_metadata=True), analysis)
+
+    def test_changed_file_is_a_miss(self):
+        analyze_and_tag_pdf.analyze_pdf(self.pdf_path)
+        make_pdf(self.pdf_path, pages=3)
+        os.utime(self.pdf_path, ns=(0, 0))
+
+        analysis = analyze_and_tag_pdf.analyze_pdf(self.pdf_path)
+        self.assertEqual(analysis["page_count"], 3)
+        self.assertEqual(len(self.cache_files()), 2)
+
+    def test_options_are_part_of_the_key(self):
+        path = self.pdf_path
+        self.assertNotEqual(analyze_and_tag_pdf._analysis_cache_file(path, False, False),
+                            analyze_and_tag_pdf._analysis_cache_file(path, True, False))
+
+    def test_malformed_entry_is_a_miss(self):
+        analysis = analyze_and_tag_pdf.analyze_pdf(self.pdf_path)
+        cache_file, = self.cache_files()
+        cache_file.write_text(json.dumps({"filename": "notes.pdf"}), encoding='utf-8')
+
+        self.assertIsNone(analyze_and_tag_pdf._load_cached_analysis(cache_file))
+        self.assertEqual(analyze_and_tag_pdf.analyze_pdf(self.pdf_path), analysis)
+
+    def test_unencodable_analysis_is_not_written(self):
+        cache_file = analyze_and_tag_pdf.ANALYSIS_CACHE_DIR / "entry.json"
+        analyze_and_tag_pdf._save_cached_analysis(cache_file, {"title": object()})
+
+        self.assertFalse(analyze_and_tag_pdf.ANALYSIS_CACHE_DIR.exists()
+                         and any(analyze_and_tag_pdf.ANALYSIS_CACHE_DIR.iterdir()))
+
+    def test_no_cache(self):
+        analyze_and_tag_pdf.analyze_pdf(self.pdf_path, use_cache=False)
+        self.assertEqual(self.cache_files(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for the mapping of heading levels to structure types in
+add_heading_tags.py and complete_accessibility_with_headings.py.
+
+Run from the repository root:
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import pikepdf
+from pikepdf import Dictionary, Array, Name
+
+from add_heading_tags import heading_type, add_heading_structure_tree, HEADING_TYPES
+from complete_accessibility_with_headings import _heading_elements
+
+
+class HeadingTypeTest(unittest.TestCase):
+
+    def test_levels_in_range(self):
+        for level in range(1, 7):
+            self.assertEqual(heading_type(level), Name(f'/H{level}'))
+
+    def test_levels_are_clamped(self):
+        self.assertEqual(heading_type(0), Name.H1)
+        self.assertEqual(heading_type(-1), Name.H1)
+        self.assertEqual(heading_type(-6), Name.H1)
+        self.assertEqual(heading_type(7), Name.H6)
+        self.assertEqual(heading_type(100), Name.H6)
+
+    def test_level_from_json_string(self):
+        self.assertEqual(heading_type("2"), Name.H2)
+
+    def test_heading_types(self):
+        self.assertEqual(HEADING_TYPES, {Name(f'/H{level}') for level in range(1, 7)})
+
+
+class HeadingStructureTreeTest(unittest.TestCase):
+
+    HEADINGS = [
+        {'page': 1, 'text': 'Zero', 'level': 0},
+        {'page': 1, 'text': 'Negative', 'level': -2},
+        {'page': 1, 'text': 'Section', 'level': 2},
+        {'page': 1, 'text': 'Deep', 'level': 9},
+    ]
+    EXPECTED = [Name.H1, Name.H1, Name.H2, Name.H6]
+
+    def test_add_heading_structure_tree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            input_path, output_path = str(Path(tmp) / "in.pdf"), str(Path(tmp) / "out.pdf")
+            pdf = pikepdf.new()
+            pdf.add_blank_page()
+            pdf.save(input_path)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                add_heading_structure_tree(input_path, output_path, self.HEADINGS)
+
+            with pikepdf.open(output_path) as pdf:
+                kids = pdf.Root.StructTreeRoot.K[0].K
+                self.assertEqual([kid.S for kid in kids], self.EXPECTED)
+                self.assertEqual([str(kid.T) for kid in kids], [h['text'] for h in self.HEADINGS])
+
+    def test_heading_elements(self):
+        pdf = pikepdf.new()
+        document_elem = pdf.make_indirect(Dictionary(Type=Name.StructElem, S=Name.Document, K=Array([])))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            elements = _heading_elements(self.HEADINGS, document_elem)
+
+        self.assertEqual([elem.S for elem in elements], self.EXPECTED)
+        self.assertFalse(any(elem.is_indirect for elem in elements))
+
+
+if __name__ == "__main__":
+    unittest.main()